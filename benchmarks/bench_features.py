@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import storage_utils
+from synthetic_data import raw_df
+from data_processing import compute_country_features, compute_labels, drop_renewable_energy_columns
+from constants import countries, renewable_energies, country_id_map
+
+def main(args):
+  # Same columns and dtypes as the hourly DataFrame that clean_data returns
+  df = raw_df(pd.Timestamp(args.start_time, tz='UTC'), pd.Timestamp(args.end_time, tz='UTC'), countries, renewable_energies + ['load'], freq='1H')
+  df = df.fillna(0).astype({col: storage_utils.value_dtype for col in df.columns.drop('Time')})
+  print(f"Generated an hourly DataFrame with {df.shape[0]} rows and {df.shape[1]} columns")
+
+  results = {}
+  for name, function in [('previous', legacy_features_and_labels), ('tensorised', features_and_labels)]:
+    start = time.perf_counter()
+    results[name] = function(df.copy())
+    elapsed = time.perf_counter() - start
+    print(f"{name:>10}: {elapsed:.3f} s, {len(df)/elapsed:,.0f} rows/s")
+
+  pd.testing.assert_frame_equal(results['previous'], results['tensorised'])
+  print("Both implementations produce the same DataFrame")
+
+def features_and_labels(df):
+  return compute_labels(compute_country_features(df))
+
+def legacy_features_and_labels(df):
+  """ Per country column sums and per row label lookup, as implemented before the tensorised ones. """
+  for country in countries:
+    green_energy_columns = [f'{country}_{renewable_energy}' for renewable_energy in renewable_energies]
+    df[f'{country}_green_energy'] = df[green_energy_columns].sum(axis=1)
+    df[f'{country}_surplus']      = df[f'{country}_green_energy'] - df[f'{country}_load']
+  df = drop_renewable_energy_columns(df)
+  df = df[['Time'] + sorted([col for col in df.columns if col != 'Time'])]
+
+  max_surplus_column = df[[f'{country}_surplus' for country in countries]].idxmax(axis=1)
+  df['label'] = max_surplus_column.apply(lambda col_name: country_id_map[col_name.split('_')[0]])
+  df['label'] = df['label'].shift(-1)
+  df = df.drop(df.index[-1])
+  df['label'] = df['label'].astype(storage_utils.label_dtype)
+  return df
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Compares the per country and the tensorised computation of the green energy, surplus and labels'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2012-01-01',
+    help='Start time of the synthetic data, format: YYYY-MM-DD [default is 2012-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='End time of the synthetic data, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  args = parser.parse_args()
+  main(args)
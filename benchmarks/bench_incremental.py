@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import storage_utils
+import telemetry_utils
+import data_processing
+from synthetic_data import raw_df
+from constants import countries, renewable_energies
+
+def main(args):
+  telemetry_utils.telemetry_file = None
+  df = storage_utils.compact_dtypes(raw_df(pd.Timestamp(args.start_time, tz='UTC'), pd.Timestamp(args.end_time, tz='UTC'), countries, renewable_energies + ['load']))
+  # Times of the daily ingestions, each one in the middle of a day whose values are still preliminary
+  ingestion_times = pd.date_range(df['Time'].iloc[-1].floor('D') - pd.Timedelta(days=args.days), df['Time'].iloc[-1].floor('D'), freq='D') + pd.Timedelta(hours=13)
+  print(f"Generated a raw DataFrame with {df.shape[0]} rows, refreshed by {args.days} daily appends")
+
+  with tempfile.TemporaryDirectory() as directory:
+    raw_file = os.path.join(directory, f'raw_data{args.format}')
+    output_file = os.path.join(directory, f'processed_data{args.format}')
+    previous_time = None
+    for ingestion_time in list(ingestion_times) + [None]:
+      # As the ingestion with --append, the rows from the start of the day of the last stored row are written again
+      rows = df if ingestion_time is None else get_preliminary_rows(df[df['Time'] < ingestion_time], ingestion_time.floor('D'))
+      if previous_time is None:
+        storage_utils.save_df(rows.reset_index(drop=True), raw_file)
+      else:
+        first_time = previous_time.floor('D')
+        storage_utils.append_df(rows[rows['Time'] >= first_time], raw_file, first_time=first_time)
+      previous_time = ingestion_time
+      start = time.perf_counter()
+      data_processing.process_incrementally(raw_file, output_file, args.chunk_size)
+      print(f"Refreshed in {time.perf_counter() - start:.3f} s")
+
+    full_output_file = os.path.join(directory, f'full_processed_data{args.format}')
+    start = time.perf_counter()
+    data_processing.process_incrementally(raw_file, full_output_file, args.chunk_size)
+    print(f"Processed the whole raw data in {time.perf_counter() - start:.3f} s")
+    pd.testing.assert_frame_equal(storage_utils.load_df(output_file), storage_utils.load_df(full_output_file), check_exact=True)
+  print("The refreshed output is the same as the one of a full run")
+
+def get_preliminary_rows(df, day_start):
+  """ The values of the last day are lower than the final ones, as if some sources had not reported yet. """
+  df = df.copy()
+  is_preliminary = df['Time'] >= day_start
+  columns = df.columns.drop('Time')
+  df.loc[is_preliminary, columns] = df.loc[is_preliminary, columns] * 0.5
+  return df
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Refreshes the processed data incrementally after daily appends that rewrite the last day, and checks it against a full run'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2022-01-01',
+    help='Start time of the synthetic data, format: YYYY-MM-DD [default is 2022-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='End time of the synthetic data, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  parser.add_argument(
+    '--days', '-d', type=int,
+    default=5,
+    help='Number of daily appends [default is 5]'
+  )
+  parser.add_argument(
+    '--chunk_size', '-c', type=int,
+    default=65536,
+    help='Number of raw rows loaded at once [default is 65536]'
+  )
+  parser.add_argument(
+    '--format', type=str,
+    default='.csv',
+    choices=['.csv', '.parquet', '.feather'],
+    help='Storage format of the raw and processed files [default is .csv]'
+  )
+  args = parser.parse_args()
+  main(args)
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+from bench_input_pipeline import BenchmarkModel
+
+def main(args):
+  model = BenchmarkModel()
+  inference_model = model.get_inference_model()
+  input_shape = model.model.input_shape[1:]
+  rng = np.random.default_rng(0)
+  windows = rng.random((args.num_windows,) + input_shape, dtype=np.float32)
+  print(f"Predicting {args.num_windows} windows of shape {input_shape}")
+
+  # Latency of a single window, after the first call that builds the graph
+  single_window = windows[:1]
+  inference_model.predict_on_batch(single_window)
+  start = time.perf_counter()
+  for _ in range(args.repeats):
+    inference_model.predict_on_batch(single_window)
+  print(f"\n{'single window':<32}{(time.perf_counter() - start) / args.repeats * 1000:10.1f} ms")
+
+  # Throughput of the training graph, whose last batch is padded, and of the inference graph with several batch sizes
+  models = [(f'training graph, batch {model.batch_size}', model.model, model.batch_size)]
+  models += [(f'inference graph, batch {batch_size}', inference_model, batch_size) for batch_size in args.batch_sizes]
+  for name, keras_model, batch_size in models:
+    padded = -len(windows) % batch_size if keras_model is model.model else 0
+    to_predict = np.concatenate([windows, np.zeros((padded,) + input_shape, dtype=np.float32)])
+    keras_model.predict(to_predict[:batch_size], batch_size=batch_size, verbose=0)
+    start = time.perf_counter()
+    keras_model.predict(to_predict, batch_size=batch_size, verbose=0)
+    print(f"{name:<32}{len(windows) / (time.perf_counter() - start):10,.0f} windows/s")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Measures the latency of a single window and the throughput of the training and the inference graphs of the model'
+  )
+  parser.add_argument(
+    '--num_windows', '-n', type=int,
+    default=4096,
+    help='Number of windows predicted to measure the throughput [default is 4096]'
+  )
+  parser.add_argument(
+    '--batch_sizes', '-b', type=int, nargs='+',
+    default=[8, 256, 2048],
+    help='Batch sizes of the inference graph [default is 8 256 2048]'
+  )
+  parser.add_argument(
+    '--repeats', '-r', type=int,
+    default=20,
+    help='Number of single window predictions averaged [default is 20]'
+  )
+  args = parser.parse_args()
+  main(args)
@@ -0,0 +1,202 @@
+import os
+import sys
+import time
+import socket
+import argparse
+import datetime
+import resource
+import tempfile
+import functools
+import subprocess
+from collections import defaultdict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import data_ingestion
+import telemetry_utils
+from buffer_utils import WideBuffer
+from utils import load_config
+
+stage_times = defaultdict(float)
+totals = defaultdict(int)
+
+def main(args):
+  port = get_free_port()
+  # The server runs in its own process, so it does not count towards the measured time and memory
+  server = subprocess.Popen([
+    sys.executable, os.path.join(os.path.dirname(__file__), 'mock_api_server.py'),
+    '--port', str(port),
+    '--latency', str(args.latency),
+    '--jitter', str(args.jitter),
+    '--failure_rate', str(args.failure_rate),
+    '--generation_types', str(args.generation_types)
+  ], stdout=subprocess.DEVNULL)
+  try:
+    wait_for_port(port)
+    instrument(f'http://127.0.0.1:{port}', args.cache_dir)
+    with tempfile.TemporaryDirectory() as directory:
+      ingestion_args = argparse.Namespace(
+        start_time=args.start_time,
+        end_time=args.end_time,
+        only_entsoe=args.only_entsoe,
+        workers=args.workers,
+        no_cache=args.cache_dir is None,
+        resume=False,
+        append=False,
+        drop_empty_rows=args.drop_empty_rows,
+        output_file=os.path.join(directory, f'raw_data{args.format}')
+      )
+      baseline_rss = get_peak_rss()
+      start = time.perf_counter()
+      data_ingestion.main(ingestion_args)
+      elapsed = time.perf_counter() - start
+      output_size = os.path.getsize(ingestion_args.output_file)
+  finally:
+    server.terminate()
+    server.wait()
+
+  print("\n--- Ingestion benchmark ---")
+  print(f"Period: {args.start_time:%Y-%m-%d} to {args.end_time:%Y-%m-%d}, {args.workers or 'default'} workers, latency {args.latency} s")
+  print(f"Total: {elapsed:.2f} s")
+  print(f"Throughput: {totals['responses']/elapsed:.1f} responses/s, {totals['bytes']/1e6/elapsed:.1f} MB/s, {totals['records']/elapsed:,.0f} records/s")
+  print(f"Downloaded: {totals['responses']} responses, {totals['bytes']/1e6:.1f} MB, {totals['records']:,} records")
+  # Whatever is not spent parsing or scattering in the fetch loop is spent waiting for the responses
+  stage_times['waiting for responses'] = stage_times.pop('fetch loop') - stage_times['parsing'] - stage_times['scattering']
+  for stage in ['waiting for responses', 'parsing', 'scattering', 'building the dataframe', 'saving']:
+    print(f"\t{stage:<24} {stage_times[stage]:8.3f} s ({stage_times[stage]/elapsed:6.1%})")
+  print(f"Output: {output_size/1e6:.1f} MB")
+  print(f"Peak RSS: {get_peak_rss():.0f} MB ({baseline_rss:.0f} MB before the ingestion)")
+
+def instrument(url, cache_dir):
+  """
+  Point the ingestion to the mock server and wrap the functions of each stage with timers.
+
+  :param url: Base url of the mock server.
+  :param cache_dir: Folder of the response cache, or None to disable it.
+  """
+  config = load_config()
+  config.set('Common', 'ENTSOEAPIUrl', f'{url}/api')
+  config.set('Common', 'ElexonAPIUrl', f'{url}/bmrs/api/v1')
+  # The mock server has no quota
+  config.set('Ingestion', 'EntsoeRequestsPerMinute', '0')
+  config.set('Ingestion', 'ElexonRequestsPerMinute', '0')
+  if cache_dir is not None:
+    config.set('Ingestion', 'CacheDir', os.path.abspath(cache_dir))
+  data_ingestion.load_config = lambda: config
+  telemetry_utils.telemetry_file = None
+
+  parse_response = timed('parsing', data_ingestion.parse_response)
+  def counted_parse_response(body, api, type):
+    data = parse_response(body, api, type)
+    totals['responses'] += 1
+    totals['bytes'] += len(body)
+    totals['records'] += len(data['Time'])
+    return data
+  data_ingestion.parse_response = counted_parse_response
+  data_ingestion.RequestClient.iter_all = timed_generator('fetch loop', data_ingestion.RequestClient.iter_all)
+  WideBuffer.write = timed('scattering', WideBuffer.write)
+  WideBuffer.to_df = timed('building the dataframe', WideBuffer.to_df)
+  data_ingestion.save_df = timed('saving', data_ingestion.save_df)
+
+def timed(stage, function):
+  @functools.wraps(function)
+  def wrapper(*args, **kwargs):
+    start = time.perf_counter()
+    try:
+      return function(*args, **kwargs)
+    finally:
+      stage_times[stage] += time.perf_counter() - start
+  return wrapper
+
+def timed_generator(stage, function):
+  """ Time a generator including the time its consumer spends between items. """
+  @functools.wraps(function)
+  def wrapper(*args, **kwargs):
+    start = time.perf_counter()
+    try:
+      yield from function(*args, **kwargs)
+    finally:
+      stage_times[stage] += time.perf_counter() - start
+  return wrapper
+
+def get_peak_rss():
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # In MB, as ru_maxrss is in KB on Linux
+
+def get_free_port():
+  with socket.socket() as s:
+    s.bind(('127.0.0.1', 0))
+    return s.getsockname()[1]
+
+def wait_for_port(port, timeout=30):
+  deadline = time.monotonic() + timeout
+  while True:
+    try:
+      socket.create_connection(('127.0.0.1', port), timeout=1).close()
+      return
+    except OSError:
+      if time.monotonic() > deadline:
+        raise
+      time.sleep(0.1)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Runs the ingestion against a local mock of the ENTSO-E and Elexon APIs and reports its throughput, time per stage and peak memory'
+  )
+  parser.add_argument(
+    '--start_time', '-s',
+    type=lambda s: datetime.datetime.strptime(s, '%Y-%m-%d'),
+    default=datetime.datetime(2022, 1, 1),
+    help='Start time of the ingested data, format: YYYY-MM-DD [default is 2022-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e',
+    type=lambda s: datetime.datetime.strptime(s, '%Y-%m-%d'),
+    default=datetime.datetime(2023, 1, 1),
+    help='End time of the ingested data, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  parser.add_argument(
+    '--only_entsoe', action='store_true',
+    help='Request the UK data to the ENTSO-E mock instead of the Elexon one [default is False]'
+  )
+  parser.add_argument(
+    '--workers', '-w', type=int,
+    default=None,
+    help='Number of concurrent requests [default is Workers in config.ini]'
+  )
+  parser.add_argument(
+    '--latency', type=float,
+    default=0.2,
+    help='Seconds the mock server waits before answering each request [default is 0.2]'
+  )
+  parser.add_argument(
+    '--jitter', type=float,
+    default=0.1,
+    help='Maximum number of seconds randomly added to the latency [default is 0.1]'
+  )
+  parser.add_argument(
+    '--failure_rate', type=float,
+    default=0,
+    help='Ratio of requests answered with a 503 [default is 0]'
+  )
+  parser.add_argument(
+    '--generation_types', type=int,
+    default=7,
+    help='Number of generation types of each ENTSO-E document, up to 24 [default is 7]'
+  )
+  parser.add_argument(
+    '--format', type=str,
+    default='.csv',
+    choices=['.csv', '.parquet', '.feather'],
+    help='Storage format of the output file [default is .csv]'
+  )
+  parser.add_argument(
+    '--drop_empty_rows', action='store_true',
+    help='Only store the timestamps with at least one value [default is False]'
+  )
+  parser.add_argument(
+    '--cache_dir', type=str,
+    default=None,
+    help='Use a response cache in this folder, running twice measures a warm cache [default is no cache]'
+  )
+  args = parser.parse_args()
+  main(args)
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import argparse
+import itertools
+import tempfile
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+import keras
+import storage_utils
+import data_processing
+from synthetic_data import raw_df
+from dataset_helpers import DatasetWrapper
+from models import RecurrentLSTMModel
+from constants import countries, renewable_energies
+
+def main(args):
+  model = BenchmarkModel()
+  with tempfile.TemporaryDirectory() as directory:
+    processed_file = os.path.join(directory, 'processed_data.parquet')
+    df = raw_df(pd.Timestamp(args.start_time, tz='UTC'), pd.Timestamp(args.end_time, tz='UTC'), countries, renewable_energies + ['load'], freq='1H')
+    df = data_processing.compute_labels(data_processing.compute_country_features(data_processing.clean_data(storage_utils.compact_dtypes(df))))
+    storage_utils.save_df(df, processed_file)
+    dataset = DatasetWrapper(
+      df_csv=processed_file,
+      batch_size=model.batch_size,
+      window_size=model.window_size,
+      countries_in_use=model.countries_in_use,
+      country_hyperparams=model.country_hyperparams,
+      phase="training"
+    )
+  print(f"Generated a processed DataFrame with {df.shape[0]} rows, batches of {model.batch_size} windows of {model.window_size} hours")
+
+  inputs = {
+    'generator': lambda: dataset.get_train_test_split_iterables(model.validation_split, repeat=True)[0],
+    'tf.data':   lambda: dataset.get_train_test_split_datasets(model.validation_split, repeat=True)[0]
+  }
+  print(f"\n{'input':<12}{'input only':>20}{'training':>20}")
+  for name, get_input in inputs.items():
+    # Only preparing the batches
+    batches = iter(get_input())
+    next(batches)
+    start = time.perf_counter()
+    for _ in itertools.islice(batches, args.num_steps):
+      pass
+    input_steps_per_s = args.num_steps / (time.perf_counter() - start)
+    # Training the model on them, the first epoch (which builds the graph) is not measured
+    timer = EpochTimer()
+    model.model.fit(get_input(), epochs=2, steps_per_epoch=args.num_steps, callbacks=[timer], verbose=0)
+    training_steps_per_s = args.num_steps / timer.durations[-1]
+    print(f"{name:<12}{input_steps_per_s:14,.1f} steps/s{training_steps_per_s:14,.1f} steps/s")
+
+class BenchmarkModel(RecurrentLSTMModel):
+  """ Model of the training, without saving its graph to the doc folder. """
+  def _create_model(self):
+    self.save_graphs = False
+    super()._create_model()
+
+class EpochTimer(keras.callbacks.Callback):
+  def on_train_begin(self, logs=None):
+    self.durations = []
+
+  def on_epoch_begin(self, epoch, logs=None):
+    self.start = time.perf_counter()
+
+  def on_epoch_end(self, epoch, logs=None):
+    self.durations.append(time.perf_counter() - self.start)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Compares the training steps per second with the generator and the tf.data input of DatasetWrapper'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2022-01-01',
+    help='Start time of the synthetic data, format: YYYY-MM-DD [default is 2022-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='End time of the synthetic data, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  parser.add_argument(
+    '--num_steps', '-n', type=int,
+    default=100,
+    help='Number of steps measured with each input [default is 100]'
+  )
+  args = parser.parse_args()
+  main(args)
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from synthetic_data import elexon_generation_json
+from parse_utils import jsons_to_df_dict, data_to_df_dict
+from constants import fuel_types
+
+def main(args):
+  # Same 14 day chunks requested by the ingestion
+  period_start = pd.Timestamp(args.start_time, tz='UTC')
+  period_end   = pd.Timestamp(args.end_time, tz='UTC')
+  jsons = []
+  while period_start < period_end:
+    jsons.append(elexon_generation_json(period_start, min(period_start+relativedelta(days=14), period_end)))
+    period_start += relativedelta(days=14)
+  print(f"Generated {len(jsons)} payloads")
+
+  results = {}
+  for name, parser in [('previous', legacy_jsons_to_df_dict), ('columnar', jsons_to_df_dict)]:
+    elapsed = min(timed(parser, jsons) for _ in range(args.repeat))
+    tracemalloc.start()
+    results[name] = parser(jsons, type='generation')
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows = sum(len(df) for df in results[name].values())
+    print(f"{name:>10}: {elapsed:.3f} s, {rows/elapsed:,.0f} rows/s, {peak/1e6:.1f} MB allocated at peak")
+
+  for psr_type, df in results['previous'].items():
+    pd.testing.assert_frame_equal(df, results['columnar'][psr_type])
+  print("Both decoders produce the same DataFrames")
+
+def timed(parser, jsons):
+  start = time.perf_counter()
+  parser(jsons, type='generation')
+  return time.perf_counter() - start
+
+def legacy_jsons_to_df_dict(jsons, type):
+  """ Per entry decoder, as implemented before the columnar one. """
+  data = { "Time": [], "UnitName": [], "Type": [], "quantity": [] }
+
+  for json in jsons:
+    for item in json:
+      startTime = pd.to_datetime(item['startTime'])
+      for generation_entry in item['data']:
+        if fuel_types[generation_entry['fuelType']] == 'nil': continue
+        data['Time'].append(startTime)
+        data['UnitName'].append('MAW')
+        data['Type'].append(fuel_types[generation_entry['fuelType']])
+        data['quantity'].append(generation_entry['generation'])
+
+  return data_to_df_dict(data)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Compares the throughput of the Elexon JSON decoders on the same synthetic generation payloads'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2021-01-01',
+    help='Start time of the synthetic payloads, format: YYYY-MM-DD [default is 2021-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='End time of the synthetic payloads, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  parser.add_argument(
+    '--repeat', type=int,
+    default=3,
+    help='Number of timed runs per decoder, the fastest one is reported [default is 3]'
+  )
+  args = parser.parse_args()
+  main(args)
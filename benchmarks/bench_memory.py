@@ -0,0 +1,195 @@
+import os
+import sys
+import argparse
+import ctypes
+import resource
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+import storage_utils
+import data_processing
+from synthetic_data import raw_df
+from buffer_utils import WideBuffer
+from dataset_helpers import DatasetWrapper
+from utils import load_config
+from constants import countries
+
+try:
+  libc = ctypes.CDLL('libc.so.6') # glibc, to trim its heap
+except OSError:
+  libc = None
+
+policies = {
+  'wide (float64/int64)':   ('float64', 'int64'),
+  'compact (float32/int8)': ('float32', 'int8')
+}
+
+def main(args):
+  config = load_config()
+  all_types = ["B{:02d}".format(i) for i in range(1, 25)] + ['load']
+  df = raw_df(pd.Timestamp(args.start_time, tz='UTC'), pd.Timestamp(args.end_time, tz='UTC'), countries, all_types)
+  print(f"Generated a raw DataFrame with {df.shape[0]} rows and {df.shape[1]} columns")
+
+  reports = {}
+  with tempfile.TemporaryDirectory() as directory:
+    for name, (value_dtype, label_dtype) in policies.items():
+      set_policy(value_dtype, label_dtype)
+      reports[name] = report = {}
+      raw_file = os.path.join(directory, f'raw_data{args.format}')
+      processed_file = os.path.join(directory, f'processed_data{args.format}')
+
+      # Ingestion: the wide table every response is scattered into, the parsed records being built beforehand
+      records = get_records(df)
+      buffer = measure(report, 'ingestion table', lambda: build_buffer(df, records))
+      storage_utils.save_df(buffer.to_df(), raw_file)
+      del buffer, records
+      # Processing: every step of data_processing.main
+      raw = measure(report, 'processing input', lambda: data_processing.load_df(raw_file, columns=data_processing.get_used_columns(raw_file)))
+      hourly = measure(report, 'hourly data', lambda: data_processing.clean_data(raw))
+      del raw
+      processed = measure(report, 'processed data', lambda: data_processing.compute_labels(data_processing.compute_country_features(hourly)))
+      del hourly
+      storage_utils.save_df(processed, processed_file)
+      del processed
+      # Training: the wrapper frames and the batches fed to the model
+      dataset = measure(report, 'dataset wrapper', lambda: DatasetWrapper(
+        df_csv=processed_file,
+        batch_size=config.getint('RecurrentLSTMModel', 'BatchSize'),
+        window_size=config.getint('RecurrentLSTMModel', 'WindowSize'),
+        countries_in_use=config.get('RecurrentLSTMModel', 'CountriesInUse').split(','),
+        country_hyperparams=config.get('RecurrentLSTMModel', 'CountryHyperparams').split(','),
+        phase="training"
+      ))
+      training, _ = dataset.get_train_test_split_iterables(repeat=False)
+      measure(report, 'model input batch', lambda: next(training))
+      del dataset, training
+
+  # tracemalloc only sees the memory allocated through Python, not the buffers allocated by Arrow (e.g. when
+  # reading Parquet and Feather files), which the growth of the RSS also counts
+  print(f"\n{'stage':<20}" + "".join(f"{name:>52}" for name in policies))
+  for stage in reports[next(iter(policies))]:
+    print(f"{stage:<20}" + "".join(
+      f"{report[stage][0]/1e6:14.1f} MB ({report[stage][1]/1e6:7.1f} MB peak, {report[stage][2]/1e6:7.1f} MB RSS)" for report in reports.values()
+    ))
+
+def set_policy(value_dtype, label_dtype):
+  """ Switch the dtype policy of every stage, which reads it from storage_utils. """
+  storage_utils.value_dtype = value_dtype
+  storage_utils.label_dtype = label_dtype
+  for module in [sys.modules['buffer_utils'], sys.modules['dataset_helpers.dataset_wrapper']]:
+    if hasattr(module, 'value_dtype'):
+      module.value_dtype = value_dtype
+
+def get_records(df):
+  """
+  Convert the synthetic DataFrame into the long records the parsers return for each country,
+  leaving out the missing values, with the quantities in the value dtype of the policy.
+
+  :return: Dictionary mapping each country to its Time, Type and quantity arrays.
+  """
+  times = pd.DatetimeIndex(df['Time']).asi8
+  records = {}
+  for country in countries:
+    columns = [column for column in df.columns if column.startswith(f'{country}_')]
+    values = df[columns].to_numpy(dtype=storage_utils.value_dtype)
+    rows, types = np.nonzero(~np.isnan(values))
+    records[country] = {
+      'Time': times[rows],
+      'Type': np.array([column.split('_', 1)[1] for column in columns])[types],
+      'quantity': values[rows, types]
+    }
+  return records
+
+def build_buffer(df, records):
+  """ Scatter the records of every country into the wide table, as the ingestion does. """
+  buffer = WideBuffer(df['Time'].iloc[0], df['Time'].iloc[-1], df.columns.drop('Time'))
+  for country, data in records.items():
+    buffer.write(country, data)
+  return buffer
+
+def measure(report, stage, function):
+  """
+  Run a stage, recording the size of its result, the peak memory allocated through Python while running it
+  and how much it raised the peak RSS of the process.
+
+  :return: The result of the stage.
+  """
+  reset_peak_rss()
+  rss = get_rss()
+  tracemalloc.start()
+  result = function()
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  report[stage] = (get_footprint(result), peak, max(get_peak_rss() - rss, 0))
+  return result
+
+def reset_peak_rss():
+  """
+  Give the freed memory back to the system, so it is not reused without growing the RSS, and reset the
+  peak RSS of the process to its current RSS, which is only possible on Linux.
+  """
+  pa.default_memory_pool().release_unused()
+  if libc is not None:
+    libc.malloc_trim(0)
+  try:
+    with open('/proc/self/clear_refs', 'w') as f:
+      f.write('5')
+  except OSError:
+    pass
+
+def get_rss():
+  """ :return: Current RSS in bytes, or the peak one where /proc is not available. """
+  return read_proc_status('VmRSS') or get_peak_rss()
+
+def get_peak_rss():
+  """ :return: Peak RSS in bytes since the last reset, or since the start of the process where it can not be reset. """
+  return read_proc_status('VmHWM') or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 # ru_maxrss is in KB on Linux
+
+def read_proc_status(field):
+  try:
+    with open('/proc/self/status') as f:
+      return next((int(line.split()[1]) * 1024 for line in f if line.startswith(f'{field}:')), None)
+  except OSError:
+    return None
+
+def get_footprint(result):
+  if isinstance(result, pd.DataFrame):
+    return result.memory_usage(deep=True).sum()
+  if isinstance(result, np.ndarray):
+    return result.nbytes
+  if isinstance(result, tuple):
+    return sum(get_footprint(item) for item in result)
+  if isinstance(result, WideBuffer):
+    return result.values.nbytes + result.filled.nbytes
+  if isinstance(result, DatasetWrapper):
+    return result.features.nbytes + (result.labels.nbytes if result.labels is not None else 0)
+  return 0
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Reports the memory used by each stage of the pipeline with wide and compact dtypes'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2022-01-01',
+    help='Start time of the synthetic data, format: YYYY-MM-DD [default is 2022-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='End time of the synthetic data, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  parser.add_argument(
+    '--format', type=str,
+    default='.parquet',
+    choices=['.csv', '.parquet', '.feather'],
+    help='Storage format of the intermediate files [default is .parquet]'
+  )
+  args = parser.parse_args()
+  main(args)
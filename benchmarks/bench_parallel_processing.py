@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import storage_utils
+from synthetic_data import raw_df
+from data_processing import clean_data, compute_country_features, process_countries_in_parallel
+from constants import countries, renewable_energies
+
+def main(args):
+  # Same columns and dtypes as the ones data_processing.main loads
+  df = raw_df(pd.Timestamp(args.start_time, tz='UTC'), pd.Timestamp(args.end_time, tz='UTC'), countries, renewable_energies + ['load'])
+  df = storage_utils.compact_dtypes(df)
+  print(f"Generated a raw DataFrame with {df.shape[0]} rows and {df.shape[1]} columns, {os.cpu_count()} cores available")
+
+  start = time.perf_counter()
+  expected = compute_country_features(clean_data(df))
+  elapsed = time.perf_counter() - start
+  print(f"{'sequential':>12}: {elapsed:.3f} s")
+  for workers in args.workers:
+    start = time.perf_counter()
+    result = process_countries_in_parallel(df, workers)
+    print(f"{f'{workers} workers':>12}: {time.perf_counter() - start:.3f} s")
+    pd.testing.assert_frame_equal(expected, result)
+  print("Every run produces the same DataFrame")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Compares the sequential and the process-parallel cleaning and feature computation of data_processing'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2020-01-01',
+    help='Start time of the synthetic data, format: YYYY-MM-DD [default is 2020-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='End time of the synthetic data, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  parser.add_argument(
+    '--workers', '-w', type=int, nargs='+',
+    default=[1, 2, 4, 9],
+    help='Numbers of processes to compare [default is 1 2 4 9]'
+  )
+  args = parser.parse_args()
+  main(args)
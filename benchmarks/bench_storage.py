@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from synthetic_data import raw_df
+from storage_utils import load_df, save_df, compact_dtypes
+from constants import countries
+
+def main(args):
+  all_types = ["B{:02d}".format(i) for i in range(1, 25)] + ['load']
+  df = raw_df(pd.Timestamp(args.start_time, tz='UTC'), pd.Timestamp(args.end_time, tz='UTC'), countries, all_types)
+  print(f"Generated a raw DataFrame with {df.shape[0]} rows and {df.shape[1]} columns")
+
+  with tempfile.TemporaryDirectory() as directory:
+    for extension in ['.csv', '.parquet', '.feather']:
+      filePath = os.path.join(directory, f'raw_data{extension}')
+      save_time = min(timed(save_df, df, filePath) for _ in range(args.repeat))
+      load_time = min(timed(load_df, filePath) for _ in range(args.repeat))
+      pd.testing.assert_frame_equal(load_df(filePath), compact_dtypes(df), check_index_type=False)
+      print(f"{extension:>9}: save {save_time:.3f} s, load {load_time:.3f} s, {os.path.getsize(filePath)/1e6:.1f} MB")
+
+def timed(function, *args):
+  start = time.perf_counter()
+  function(*args)
+  return time.perf_counter() - start
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Compares the load and save times and the file sizes of the supported storage formats'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2022-01-01',
+    help='Start time of the synthetic data, format: YYYY-MM-DD [default is 2022-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='End time of the synthetic data, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  parser.add_argument(
+    '--repeat', type=int,
+    default=3,
+    help='Number of timed runs per operation, the fastest one is reported [default is 3]'
+  )
+  args = parser.parse_args()
+  main(args)
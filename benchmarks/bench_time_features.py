@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+from dataset_helpers import DatasetWrapper
+
+def main(args):
+  df = pd.DataFrame({'Time': pd.date_range(args.start_time, args.end_time, freq='1H', tz='UTC', inclusive='left')})
+  print(f"Encoding the time of {df.shape[0]} hourly rows")
+
+  results = {}
+  for name, function in [('row-wise apply', legacy_transform_to_circular_timevalues), ('vectorized', DatasetWrapper._transform_to_circular_timevalues)]:
+    start = time.perf_counter()
+    results[name] = function(df.copy())
+    elapsed = time.perf_counter() - start
+    print(f"{name:>15}: {elapsed:8.3f} s ({df.shape[0]/elapsed:14,.0f} rows/s)")
+
+  pd.testing.assert_frame_equal(*results.values(), check_exact=True)
+  print("Both implementations produce the same columns")
+
+def legacy_transform_to_circular_timevalues(df):
+  """ Row-wise encoding, as implemented before the vectorized one. """
+  df['Time_hour_x'],  df['Time_hour_y']  = zip(*df.apply(lambda row: legacy_calculate_circular_coordinates(row['Time'], 'hour' ), axis=1))
+  df['Time_week_x'],  df['Time_week_y']  = zip(*df.apply(lambda row: legacy_calculate_circular_coordinates(row['Time'], 'week' ), axis=1))
+  df['Time_month_x'], df['Time_month_y'] = zip(*df.apply(lambda row: legacy_calculate_circular_coordinates(row['Time'], 'month'), axis=1))
+  return df.drop(columns=['Time']).astype(np.float32)
+
+def legacy_calculate_circular_coordinates(timestamp, stage):
+  if stage == 'hour':
+    return DatasetWrapper._circular_coordinates(24)[timestamp.hour]
+  elif stage == 'week':
+    return DatasetWrapper._circular_coordinates(7)[timestamp.weekday()]
+  elif stage == 'month':
+    return DatasetWrapper._circular_coordinates(12)[timestamp.month-1]
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Compares the row-wise and the vectorized encoding of the cyclical time features of DatasetWrapper'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2018-01-01',
+    help='Start time of the hourly timestamps, format: YYYY-MM-DD [default is 2018-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='End time of the hourly timestamps, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  args = parser.parse_args()
+  main(args)
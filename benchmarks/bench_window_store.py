@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+import storage_utils
+import data_processing
+import telemetry_utils
+from synthetic_data import raw_df
+from dataset_helpers import DatasetWrapper
+from utils import load_config
+from constants import countries, renewable_energies
+
+def main(args):
+  telemetry_utils.telemetry_file = None
+  config = load_config()
+  params = dict(
+    batch_size=config.getint('RecurrentLSTMModel', 'BatchSize'),
+    window_size=config.getint('RecurrentLSTMModel', 'WindowSize'),
+    countries_in_use=config.get('RecurrentLSTMModel', 'CountriesInUse').split(','),
+    country_hyperparams=config.get('RecurrentLSTMModel', 'CountryHyperparams').split(','),
+    phase="training"
+  )
+  with tempfile.TemporaryDirectory() as directory:
+    processed_file = os.path.join(directory, f'processed_data{args.format}')
+    df = raw_df(pd.Timestamp(args.start_time, tz='UTC'), pd.Timestamp(args.end_time, tz='UTC'), countries, renewable_energies + ['load'], freq='1H')
+    df = data_processing.compute_labels(data_processing.compute_country_features(data_processing.clean_data(storage_utils.compact_dtypes(df))))
+    storage_utils.save_df(df, processed_file)
+    print(f"Generated a processed DataFrame with {df.shape[0]} rows, stored as {args.format}")
+
+    store_dir = os.path.join(directory, 'windows')
+    for name, store in [('without store', None), ('storing', store_dir), ('stored', store_dir)]:
+      start = time.perf_counter()
+      dataset = DatasetWrapper(df_csv=processed_file, store_dir=store, **params)
+      elapsed = time.perf_counter() - start
+      print(f"{name:>15}: {elapsed:8.3f} s to prepare the windows of {dataset.df_length} rows")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Compares the startup of DatasetWrapper preparing the windows and memory-mapping the stored ones'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2018-01-01',
+    help='Start time of the synthetic data, format: YYYY-MM-DD [default is 2018-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='End time of the synthetic data, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  parser.add_argument(
+    '--format', type=str,
+    default='.csv',
+    choices=['.csv', '.parquet', '.feather'],
+    help='Storage format of the processed file [default is .csv]'
+  )
+  args = parser.parse_args()
+  main(args)
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import argparse
+import itertools
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+import storage_utils
+import data_processing
+from synthetic_data import raw_df
+from dataset_helpers import DatasetWrapper
+from utils import load_config
+from constants import countries, renewable_energies
+
+def main(args):
+  config = load_config()
+  params = dict(
+    batch_size=config.getint('RecurrentLSTMModel', 'BatchSize') if args.batch_size is None else args.batch_size,
+    window_size=config.getint('RecurrentLSTMModel', 'WindowSize'),
+    countries_in_use=config.get('RecurrentLSTMModel', 'CountriesInUse').split(','),
+    country_hyperparams=config.get('RecurrentLSTMModel', 'CountryHyperparams').split(','),
+    phase="training"
+  )
+  with tempfile.TemporaryDirectory() as directory:
+    processed_file = os.path.join(directory, 'processed_data.parquet')
+    df = raw_df(pd.Timestamp(args.start_time, tz='UTC'), pd.Timestamp(args.end_time, tz='UTC'), countries, renewable_energies + ['load'], freq='1H')
+    df = data_processing.compute_labels(data_processing.compute_country_features(data_processing.clean_data(storage_utils.compact_dtypes(df))))
+    storage_utils.save_df(df, processed_file)
+    print(f"Generated a processed DataFrame with {df.shape[0]} rows, batches of {params['batch_size']} windows of {params['window_size']} hours")
+
+    batches = {}
+    for name, wrapper_class in [('previous', LegacyDatasetWrapper), ('sliding window', DatasetWrapper)]:
+      dataset = wrapper_class(df_csv=processed_file, **params)
+      iterable, _ = dataset.get_train_test_split_iterables(validation_split=0)
+      start = time.perf_counter()
+      batches[name] = list(itertools.islice(iterable, args.num_batches))
+      elapsed = time.perf_counter() - start
+      num_batches = len(batches[name])
+      print(f"{name:>15}: {num_batches/elapsed:10,.1f} batches/s, {num_batches*params['batch_size']/elapsed:12,.0f} windows/s")
+
+  # The rows after the last sample of the previous implementation were left uninitialised
+  num_samples = df.shape[0] - 1
+  for i, (previous, current) in enumerate(zip(batches['previous'], batches['sliding window'])):
+    num_rows = min(params['batch_size'], num_samples - i*params['batch_size'])
+    assert np.array_equal(previous[0][:num_rows], current[0][:num_rows]) and np.array_equal(previous[1][:num_rows], current[1][:num_rows])
+  print("Both implementations produce the same batches")
+
+class LegacyDatasetWrapper(DatasetWrapper):
+  """ Per sample and per country batch preparation, as implemented before the sliding window one. """
+  def __init__(self, df_csv, **kwargs):
+    super().__init__(df_csv, **kwargs)
+    df = self._load_df(filePath=df_csv)
+    df = self._transform_to_circular_timevalues(df)
+    self.df = self._prepend_empty_rows(df, self.window_size-1)
+    self.country_dfs = self._filter_unused_hyperparams(self._split_country_dfs(self.df, self.countries_in_use), self.country_hyperparams)
+
+  def _process_batch(self, start_index, end_index):
+    from keras.utils import to_categorical
+    batch = np.empty(shape=(self.batch_size, len(self.countries_in_use), self.window_size, len(self.country_hyperparams)-1), dtype=storage_utils.value_dtype)
+    if self.phase == "training":
+      batch_labels = np.empty(shape=(self.batch_size, len(countries)), dtype=storage_utils.value_dtype)
+    for batch_index, sample_index in enumerate(range(start_index, end_index)):
+      for country in self.countries_in_use:
+        country_window = self.country_dfs[country].iloc[sample_index-self.window_size+1 : sample_index+1]
+        batch[batch_index, self.countries_in_use.index(country)] = country_window.values.reshape(self.window_size, -1)
+      if self.phase == "training":
+        batch_labels[batch_index] = to_categorical(int(self.df.iloc[sample_index]["label"]), num_classes=len(countries))
+    if self.phase == "training":
+      return batch, batch_labels
+    else:
+      return batch
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Compares the throughput of the per sample and the sliding window batch preparation of DatasetWrapper'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2022-01-01',
+    help='Start time of the synthetic data, format: YYYY-MM-DD [default is 2022-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='End time of the synthetic data, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  parser.add_argument(
+    '--batch_size', '-b', type=int,
+    default=None,
+    help='Number of windows per batch [default is BatchSize in config.ini]'
+  )
+  parser.add_argument(
+    '--num_batches', '-n', type=int,
+    default=None,
+    help='Number of batches prepared by each implementation [default is the whole dataset]'
+  )
+  args = parser.parse_args()
+  main(args)
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+import xml.etree.ElementTree as ET
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from synthetic_data import entsoe_xml
+from parse_utils import xmls_to_df_dict, data_to_df_dict
+
+def main(args):
+  period_start = pd.Timestamp(args.start_time, tz='UTC')
+  period_end   = pd.Timestamp(args.end_time, tz='UTC')
+  xmls = [entsoe_xml('generation', period_start, period_end, resolution=args.resolution)]
+  print(f"Generated {sum(len(xml) for xml in xmls)/1e6:.1f} MB of XML")
+
+  results = {}
+  for name, parser in [('previous', legacy_xmls_to_df_dict), ('streaming', xmls_to_df_dict)]:
+    elapsed = min(timed(parser, xmls) for _ in range(args.repeat))
+    results[name] = parser(xmls, type='generation')
+    rows = sum(len(df) for df in results[name].values())
+    print(f"{name:>10}: {elapsed:.3f} s, {rows/elapsed:,.0f} rows/s")
+
+  for psr_type, df in results['previous'].items():
+    pd.testing.assert_frame_equal(df, results['streaming'][psr_type])
+  print("Both parsers produce the same DataFrames")
+
+def timed(parser, xmls):
+  start = time.perf_counter()
+  parser(xmls, type='generation')
+  return time.perf_counter() - start
+
+def legacy_xmls_to_df_dict(xmls, type):
+  """ Tree based parser, as implemented before the streaming one. """
+  data = { "Time": [], "UnitName": [], "Type": [], "quantity": [] }
+
+  for xml in xmls:
+    root = ET.fromstring(xml)
+    namespace = { 'ns': root.tag.split('}', 1)[0][1:] }
+
+    for time_series in root.findall('.//ns:TimeSeries', namespace):
+      if type == 'generation':
+        psr_type = time_series.find('ns:MktPSRType/ns:psrType', namespace).text
+      unit_name = time_series.find('ns:quantity_Measure_Unit.name', namespace).text
+      for period in time_series.findall('ns:Period', namespace):
+        start_time = pd.to_datetime(period.find('ns:timeInterval/ns:start', namespace).text)
+        resolution = int(period.find('ns:resolution', namespace).text.replace('PT', '').replace('M', ''))
+        for point in period.findall('ns:Point', namespace):
+          position = int(point.find('ns:position', namespace).text)
+          quantity = int(point.find('ns:quantity', namespace).text)
+          data['Time'].append(start_time + pd.to_timedelta((position-1) * resolution, unit='m'))
+          data['UnitName'].append(unit_name)
+          data['Type'].append('load' if type == 'load' else psr_type)
+          data['quantity'].append(quantity)
+
+  return data_to_df_dict(data)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Compares the throughput of the ENTSO-E XML parsers on the same synthetic document'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2022-01-01',
+    help='Start time of the synthetic document, format: YYYY-MM-DD [default is 2022-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2022-03-01',
+    help='End time of the synthetic document, format: YYYY-MM-DD [default is 2022-03-01]'
+  )
+  parser.add_argument(
+    '--resolution', '-r', type=int,
+    default=15,
+    help='Resolution of the series in minutes [default is 15]'
+  )
+  parser.add_argument(
+    '--repeat', type=int,
+    default=3,
+    help='Number of timed runs per parser, the fastest one is reported [default is 3]'
+  )
+  args = parser.parse_args()
+  main(args)
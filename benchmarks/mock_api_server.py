@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+import pandas as pd
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from synthetic_data import entsoe_xml, elexon_demand_json, elexon_generation_json
+
+# Zones that publish hourly data instead of quarter-hourly data, as the real ENTSO-E API does for some of them
+hourly_regions = [ '10YES-REE------0', '10YPL-AREA-----S' ]
+all_psr_types = ["B{:02d}".format(i) for i in range(1, 25)]
+
+class MockAPIServer(ThreadingHTTPServer):
+  """
+  Local stand-in for the ENTSO-E and Elexon APIs, serving synthetic documents.
+
+  The ENTSO-E endpoint is served at /api and the Elexon ones at /bmrs/api/v1, so the urls in
+  config.ini can be pointed to http://host:port/api and http://host:port/bmrs/api/v1. The
+  content of each response only depends on its query parameters, so runs are reproducible.
+  """
+  daemon_threads = True
+
+  def __init__(self, port=0, latency=0, jitter=0, failure_rate=0, generation_types=7, seed=0):
+    """
+    :param port: Port to listen to, 0 picks a free one.
+    :param latency: Seconds waited before answering each request.
+    :param jitter: Maximum number of seconds randomly added to the latency.
+    :param failure_rate: Ratio of requests answered with a 503, to exercise the retries.
+    :param generation_types: Number of generation types of each ENTSO-E A75 document.
+    :param seed: Seed of the synthetic quantities.
+    """
+    super().__init__(('127.0.0.1', port), MockAPIHandler)
+    self.latency      = latency
+    self.jitter       = jitter
+    self.failure_rate = failure_rate
+    self.psr_types    = all_psr_types[:generation_types]
+    self.seed         = seed
+    self.requests     = 0
+    self._random      = random.Random(seed)
+    self._lock        = threading.Lock()
+
+  @property
+  def url(self):
+    return f'http://127.0.0.1:{self.server_address[1]}'
+
+  def start(self):
+    """
+    Serve the requests in a background thread.
+
+    :return: The server itself.
+    """
+    threading.Thread(target=self.serve_forever, daemon=True).start()
+    return self
+
+  def next_delay_and_failure(self):
+    with self._lock:
+      self.requests += 1
+      return self.latency + self._random.uniform(0, self.jitter), self._random.random() < self.failure_rate
+
+  def get_body(self, path, params):
+    """
+    Generate the body of a request.
+
+    :param path: Path of the request url.
+    :param params: Dictionary with the query parameters.
+    :return: (status code, content type, body) tuple.
+    """
+    params = { name: value for name, value in params.items() if name != 'securityToken' }
+    seed = zlib.crc32(json.dumps([path, params, self.seed], sort_keys=True).encode())
+    if path == '/api':
+      region = params.get('outBiddingZone_Domain') or params.get('in_Domain')
+      body = entsoe_xml(
+        'load' if params['documentType'] == 'A65' else 'generation',
+        pd.to_datetime(params['periodStart'], format='%Y%m%d%H%M', utc=True),
+        pd.to_datetime(params['periodEnd'], format='%Y%m%d%H%M', utc=True),
+        resolution=60 if region in hourly_regions else 15,
+        psr_types=self.psr_types,
+        seed=seed
+      )
+      return 200, 'application/xml', body
+    if path.endswith('/demand'):
+      # Both settlement dates are included in the response
+      body = elexon_demand_json(
+        pd.Timestamp(params['settlementDateFrom'], tz='UTC'),
+        pd.Timestamp(params['settlementDateTo'], tz='UTC') + pd.Timedelta(days=1),
+        seed=seed
+      )
+      return 200, 'application/json', json.dumps(body)
+    if path.endswith('/generation/outturn/summary'):
+      body = elexon_generation_json(
+        pd.Timestamp(params['startTime'], tz='UTC'),
+        pd.Timestamp(params['endTime'], tz='UTC'),
+        seed=seed
+      )
+      return 200, 'application/json', json.dumps(body)
+    return 404, 'text/plain', f'Unknown endpoint {path}'
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1' # Keep-alive, as the real APIs
+
+  def do_GET(self):
+    delay, fail = self.server.next_delay_and_failure()
+    time.sleep(delay)
+    if fail:
+      status_code, content_type, body = 503, 'text/plain', 'Service temporarily unavailable'
+    else:
+      url = urlsplit(self.path)
+      status_code, content_type, body = self.server.get_body(url.path, dict(parse_qsl(url.query)))
+    body = body.encode()
+    self.send_response(status_code)
+    self.send_header('Content-Type', content_type)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Serves synthetic ENTSO-E and Elexon responses locally'
+  )
+  parser.add_argument(
+    '--port', '-p', type=int,
+    default=8765,
+    help='Port to listen to [default is 8765]'
+  )
+  parser.add_argument(
+    '--latency', type=float,
+    default=0,
+    help='Seconds waited before answering each request [default is 0]'
+  )
+  parser.add_argument(
+    '--jitter', type=float,
+    default=0,
+    help='Maximum number of seconds randomly added to the latency [default is 0]'
+  )
+  parser.add_argument(
+    '--failure_rate', type=float,
+    default=0,
+    help='Ratio of requests answered with a 503 [default is 0]'
+  )
+  parser.add_argument(
+    '--generation_types', type=int,
+    default=7,
+    help='Number of generation types of each ENTSO-E document, up to 24 [default is 7]'
+  )
+  args = parser.parse_args()
+  server = MockAPIServer(args.port, args.latency, args.jitter, args.failure_rate, args.generation_types)
+  print(f"Serving ENTSO-E at {server.url}/api and Elexon at {server.url}/bmrs/api/v1")
+  server.serve_forever()
@@ -0,0 +1,101 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from constants import fuel_types
+
+entsoe_namespace = 'urn:iec62325.351:tc57wg16:451-6:generationloaddocument:3:0'
+
+def entsoe_xml(type, period_start, period_end, resolution=15, psr_types=None, seed=0):
+  """
+  Generate an ENTSO-E A65 (load) or A75 (generation) document with one TimeSeries per day and type.
+
+  :param type: Either 'load' or 'generation'.
+  :param period_start: Start of the document, as a UTC pd.Timestamp.
+  :param period_end: End of the document, as a UTC pd.Timestamp.
+  :param resolution: Resolution of the series in minutes.
+  :param psr_types: Generation types included in the document [default is B01, B04, B10, B11, B16, B18 and B19].
+  :param seed: Seed of the random quantities.
+  :return: Text of the document.
+  """
+  rng = np.random.default_rng(seed)
+  psr_types = ['load'] if type == 'load' else (psr_types or ['B01', 'B04', 'B10', 'B11', 'B16', 'B18', 'B19'])
+  days = pd.date_range(period_start, period_end, freq='D')
+  document = [f'<?xml version="1.0" encoding="UTF-8"?>\n<GL_MarketDocument xmlns="{entsoe_namespace}">']
+  for psr_type in psr_types:
+    for day_start, day_end in zip(days[:-1], days[1:]):
+      document.append('<TimeSeries>')
+      if type == 'generation':
+        document.append(f'<MktPSRType><psrType>{psr_type}</psrType></MktPSRType>')
+      document.append('<quantity_Measure_Unit.name>MAW</quantity_Measure_Unit.name><Period>')
+      document.append(f'<timeInterval><start>{day_start:%Y-%m-%dT%H:%MZ}</start><end>{day_end:%Y-%m-%dT%H:%MZ}</end></timeInterval>')
+      document.append(f'<resolution>PT{resolution}M</resolution>')
+      num_points = int((day_end-day_start) / pd.Timedelta(minutes=resolution))
+      quantities = rng.integers(0, 40000, num_points)
+      for position in np.flatnonzero(rng.random(num_points) > 0.01) + 1: # Points may be missing
+        document.append(f'<Point><position>{position}</position><quantity>{quantities[position-1]}</quantity></Point>')
+      document.append('</Period></TimeSeries>')
+  document.append('</GL_MarketDocument>')
+  return '\n'.join(document)
+
+def elexon_demand_json(period_start, period_end, seed=0):
+  """
+  Generate an Elexon /demand payload with 30 minute settlement periods.
+
+  :param period_start: Start of the payload, as a UTC pd.Timestamp.
+  :param period_end: End of the payload, as a UTC pd.Timestamp.
+  :param seed: Seed of the random demands.
+  :return: Decoded JSON payload.
+  """
+  rng = np.random.default_rng(seed)
+  times = pd.date_range(period_start, period_end, freq='30T', inclusive='left')
+  demands = rng.integers(15000, 45000, len(times))
+  return { 'data': [
+    { 'startTime': f'{time:%Y-%m-%dT%H:%M:%SZ}', 'initialDemandOutturn': int(demand) }
+    for time, demand in zip(times, demands)
+  ] }
+
+def elexon_generation_json(period_start, period_end, seed=0):
+  """
+  Generate an Elexon /generation/outturn/summary payload with 30 minute periods and every known fuel type.
+
+  :param period_start: Start of the payload, as a UTC pd.Timestamp.
+  :param period_end: End of the payload, as a UTC pd.Timestamp.
+  :param seed: Seed of the random generations.
+  :return: Decoded JSON payload.
+  """
+  rng = np.random.default_rng(seed)
+  times = pd.date_range(period_start, period_end, freq='30T', inclusive='left')
+  generations = rng.integers(0, 15000, (len(times), len(fuel_types)))
+  return [
+    { 'startTime': f'{time:%Y-%m-%dT%H:%M:%SZ}', 'data': [
+      { 'fuelType': fuel_type, 'generation': int(generation) } for fuel_type, generation in zip(fuel_types, time_generations)
+    ] }
+    for time, time_generations in zip(times, generations)
+  ]
+
+def raw_df(period_start, period_end, countries, types, missing_ratio=0.2, seed=0, freq='15T'):
+  """
+  Generate a wide raw DataFrame like the one written by the ingestion.
+
+  :param period_start: Start of the data, as a UTC pd.Timestamp.
+  :param period_end: End of the data, as a UTC pd.Timestamp.
+  :param countries: List of country codes.
+  :param types: List of parameters per country (e.g. B01 or load).
+  :param missing_ratio: Ratio of the columns that are completely empty.
+  :param seed: Seed of the random values.
+  :param freq: Sampling frequency of the rows [default is 15 minutes].
+  :return: DataFrame with a Time column followed by the sorted {country}_{type} columns.
+  """
+  rng = np.random.default_rng(seed)
+  times = pd.date_range(period_start, period_end, freq=freq, inclusive='left')
+  columns = sorted(f'{country}_{type}' for country in countries for type in types)
+  values = rng.integers(0, 40000, (len(times), len(columns))).astype(np.float64)
+  values[:, rng.random(len(columns)) < missing_ratio] = np.nan
+  values[rng.random(values.shape) < 0.01] = np.nan
+  df = pd.DataFrame(values, columns=columns)
+  df.insert(0, 'Time', times)
+  return df
@@ -2,12 +2,14 @@
 
 script_dir="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
 
-# Create the virtual environment
-python -m venv $script_dir/../env
-# Check if creation was successful
-if [ "$?" -ne "0" ]; then
-  echo "Error creating the virtual environment."
-  exit 1
+# Create the virtual environment, only the first time
+if [ ! -d "$script_dir/../env" ]; then
+  python -m venv $script_dir/../env
+  # Check if creation was successful
+  if [ "$?" -ne "0" ]; then
+    echo "Error creating the virtual environment."
+    exit 1
+  fi
 fi
 # Activate the virtual environment
 if [ -f "$script_dir/../env/bin/activate" ]; then
@@ -21,24 +23,22 @@ else
   exit 1 
 fi
 
-# Install the requirements
-echo "Installing requirements..."
-pip install -r $script_dir/../requirements.txt
-echo "Requirements installed."
-
-# Run the data ingestion script
-echo "Starting data ingestion..."
-python $script_dir/../src/data_ingestion.py --start_time 2022-01-01 --end_time 2023-01-01 --output_file "$script_dir/../data/raw_data.csv"
-echo "Finished data ingestion."
-
-# Run the data processing script
-echo "Starting data processing..."
-python $script_dir/../src/data_processing.py --input_file "$script_dir/../data/raw_data.csv" --output_file "$script_dir/../data/processed_data.csv"
-echo "Finished data processing."
-
-# Run the model prediction script
-echo "Starting prediction..."
-python $script_dir/../src/model_prediction.py --model_type "recurrentLSTM" --model_file "$script_dir/../models/model.pkl" --input_file "$script_dir/../data/test.csv" --output_file "$script_dir/../predictions/predictions.json"
-echo "Finished inference."
+# Install the requirements, only when they changed since the last installation
+requirements_hash=$(python -c "import hashlib, sys; print(hashlib.sha256(open(sys.argv[1], 'rb').read()).hexdigest())" "$script_dir/../requirements.txt")
+if [ "$requirements_hash" != "$(cat "$script_dir/../env/.requirements_hash" 2>/dev/null)" ]; then
+  echo "Installing requirements..."
+  pip install -r $script_dir/../requirements.txt && echo "$requirements_hash" > "$script_dir/../env/.requirements_hash"
+  echo "Requirements installed."
+else
+  echo "Requirements already installed."
+fi
 
-echo "Pipeline completed."
\ No newline at end of file
+# Run the stages whose outputs are not up to date: ingestion, processing and prediction with the existing model and test subset
+# Add --targets training prediction to also train the model (or test_subset to extract the test subset again)
+python $script_dir/../src/pipeline.py --start_time 2022-01-01 --end_time 2023-01-01 \
+  --raw_data_file "$script_dir/../data/raw_data.csv" \
+  --processed_data_file "$script_dir/../data/processed_data.csv" \
+  --test_data_file "$script_dir/../data/test.csv" \
+  --model_type "recurrentLSTM" --model_file "$script_dir/../models/model.pkl" \
+  --predictions_file "$script_dir/../predictions/predictions.json" \
+  "$@"
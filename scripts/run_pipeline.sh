@@ -2,6 +2,8 @@
 
 # You can run this script from the command line using:
 # ./run_pipeline.sh <start_date> <end_date> <raw_data_file> <processed_data_file> <model_file> <test_data_file> <predictions_file>
+# Only the stages whose outputs are not up to date are run, add --force to run all of them.
+# The model is not trained unless --targets training prediction is added.
 # For example:
 # ./run_pipeline.sh 2020-01-01 2020-01-31 data/raw_data.csv data/processed_data.csv models/model.pkl data/test_data.csv predictions/predictions.json
 
@@ -14,12 +16,16 @@ model_file="$5"
 test_data_file="$6"
 predictions_file="$7"
 
-# Create the virtual environment
-python -m venv $script_dir/../env
-# Check if creation was successful
-if [ "$?" -ne "0" ]; then
-  echo "Error creating the virtual environment."
-  exit 1
+script_dir="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+
+# Create the virtual environment, only the first time
+if [ ! -d "$script_dir/../env" ]; then
+  python -m venv $script_dir/../env
+  # Check if creation was successful
+  if [ "$?" -ne "0" ]; then
+    echo "Error creating the virtual environment."
+    exit 1
+  fi
 fi
 # Activate the virtual environment
 if [ -f "$script_dir/../env/bin/activate" ]; then
@@ -33,23 +39,22 @@ else
   exit 1 
 fi
 
-# Install the requirements
-echo "Installing requirements..."
-pip install -r $script_dir/../requirements.txt
-echo "Requirements installed."
-
-# Run the data ingestion script
-echo "Starting data ingestion..."
-python $script_dir/../src/data_ingestion.py --start_time $start_date --end_time $end_date --output_file $raw_data_file
-echo "Finished data ingestion."
-
-# Run the data processing script
-echo "Starting data processing..."
-python $script_dir/../src/data_processing.py --input_file $raw_data_file --output_file $processed_data_file
-echo "Finished data processing."
+# Install the requirements, only when they changed since the last installation
+requirements_hash=$(python -c "import hashlib, sys; print(hashlib.sha256(open(sys.argv[1], 'rb').read()).hexdigest())" "$script_dir/../requirements.txt")
+if [ "$requirements_hash" != "$(cat "$script_dir/../env/.requirements_hash" 2>/dev/null)" ]; then
+  echo "Installing requirements..."
+  pip install -r $script_dir/../requirements.txt && echo "$requirements_hash" > "$script_dir/../env/.requirements_hash"
+  echo "Requirements installed."
+else
+  echo "Requirements already installed."
+fi
 
-# Run the model prediction script
-echo "Starting prediction..."
-python $script_dir/../src/model_prediction.py --model_type "recurrentLSTM" --model_file $model_file --input_file $test_data_file --output_file $predictions_file
-echo "Finished inference."
-echo "Pipeline completed."
+# Run the stages whose outputs are not up to date: ingestion, processing and prediction with the existing model and test subset
+# Add --targets training prediction to also train the model (or test_subset to extract the test subset again)
+python $script_dir/../src/pipeline.py --start_time $start_date --end_time $end_date \
+  --raw_data_file $raw_data_file \
+  --processed_data_file $processed_data_file \
+  --test_data_file $test_data_file \
+  --model_type "recurrentLSTM" --model_file $model_file \
+  --predictions_file $predictions_file \
+  "${@:8}"
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+import telemetry_utils
+from storage_utils import value_dtype
+
+class WideBuffer:
+  """
+  Preallocated wide table (of the compact value dtype) with one row per time step and one column per country and type.
+
+  Each parsed chunk of long (Time, Type, quantity) records is scattered into it in a single
+  pass as soon as it arrives, so the raw responses never need to be kept in memory. As it
+  was the case when concatenating the partial DataFrames, the first value received for a
+  given cell is the one that is kept.
+  """
+  def __init__(self, period_start, period_end, columns, freq='15T'):
+    """
+    :param period_start: First timestamp of the table, as a UTC pd.Timestamp.
+    :param period_end: Last timestamp of the table, as a UTC pd.Timestamp.
+    :param columns: Initial list of columns, more are added if unknown ones are written.
+    :param freq: Time step between rows. Timestamps that do not fall on a step are discarded.
+    """
+    self.start        = period_start
+    self.freq         = pd.Timedelta(freq)
+    self.columns      = sorted(columns)
+    self.column_index = { column: i for i, column in enumerate(self.columns) }
+    num_rows = (period_end - period_start) // self.freq + 1
+    self.values = np.full((num_rows, len(self.columns)), np.nan, dtype=value_dtype)
+    self.filled = np.zeros((num_rows, len(self.columns)), dtype=bool)
+
+  @telemetry_utils.timed
+  def write(self, country, data):
+    """
+    Write the long records of a country, keeping the values already present.
+
+    :param country: Country code, prefix of the columns.
+    :param data: Dictionary with the Time (nanoseconds since epoch), Type and quantity arrays.
+    """
+    steps, remainders = np.divmod(data['Time'] - self.start.value, self.freq.value)
+    is_valid = (remainders == 0) & (steps >= 0) & (steps < len(self.values))
+    types, type_codes = np.unique(data['Type'][is_valid], return_inverse=True)
+    column_lookup = np.array([self._get_column_index(f'{country}_{type}') for type in types], dtype=np.int64)
+    # Only the first record of each cell is taken into account
+    cells, first_records = np.unique(steps[is_valid] * len(self.columns) + column_lookup[type_codes], return_index=True)
+    rows, columns = np.divmod(cells, len(self.columns))
+    quantities = np.asarray(data['quantity'])[is_valid][first_records]
+    is_new = ~self.filled[rows, columns]
+    self.values[rows[is_new], columns[is_new]] = quantities[is_new]
+    self.filled[rows[is_new], columns[is_new]] = True
+
+  def last_time(self):
+    """
+    :return: Timestamp of the last written row, or None if nothing was written.
+    """
+    written_rows = np.flatnonzero(self.filled.any(axis=1))
+    return self.start + written_rows[-1]*self.freq if len(written_rows) else None
+
+  @telemetry_utils.timed
+  def to_df(self, start=None, drop_empty_rows=False):
+    """
+    Build the DataFrame with the rows between the first and the last written ones, without copying them.
+
+    :param start: Optional timestamp of the first row, instead of the first written one.
+    :param drop_empty_rows: Whether to leave out the rows without any value (e.g. the 15 minute steps of hourly series).
+    :return: DataFrame with a Time column followed by the sorted data columns.
+    """
+    written_rows = np.flatnonzero(self.filled.any(axis=1))
+    first_row = written_rows[0] if start is None else (start - self.start) // self.freq
+    last_row  = written_rows[-1]
+    times = pd.date_range(self.start + first_row*self.freq, self.start + last_row*self.freq, freq=self.freq)
+    if drop_empty_rows:
+      rows = written_rows[written_rows >= first_row]
+      df = pd.DataFrame(self.values[rows], columns=self.columns)
+      times = times[rows - first_row]
+    else:
+      df = pd.DataFrame(self.values[first_row:last_row+1], columns=self.columns, copy=False)
+    df.insert(0, 'Time', times)
+    if self.columns != sorted(self.columns):
+      df = df[['Time'] + sorted(self.columns)]
+    return df
+
+  def _get_column_index(self, column):
+    if column not in self.column_index:
+      # Unknown types are unexpected, so growing the table (which copies it) is acceptable
+      self.column_index[column] = len(self.columns)
+      self.columns.append(column)
+      self.values = np.column_stack((self.values, np.full(len(self.values), np.nan, dtype=value_dtype)))
+      self.filled = np.column_stack((self.filled, np.zeros(len(self.filled), dtype=bool)))
+    return self.column_index[column]
@@ -0,0 +1,157 @@
+import os
+import time
+import json
+import hashlib
+import threading
+
+from datetime import datetime, timedelta
+
+class ResponseCache:
+  """
+  Content-addressed on-disk cache of API responses.
+
+  Every entry is keyed by the endpoint and the query parameters of the request (the
+  security token is left out, so it can be rotated without invalidating the cache).
+  Only the responses of closed windows are served from disk: windows that end within
+  the last recent_days are always requested again, as the API may still update them.
+  For the same reason, a response downloaded while its window was still recent is
+  requested again once the window is closed, instead of being served as final.
+
+  The keys stored since the last completed run are recorded in a progress journal, so
+  a run that failed can be resumed serving every response it already received, even
+  the ones of recent windows.
+  """
+  ignored_params = [ 'securityToken' ]
+  progress_file  = 'progress.journal'
+
+  def __init__(self, directory, max_size_mb=2048, max_age_days=90, recent_days=7, resume=False):
+    """
+    :param directory: Folder where the cached responses are stored.
+    :param max_size_mb: Maximum size of the cache, the least recently used entries are evicted first.
+    :param max_age_days: Maximum age of an entry before it is evicted.
+    :param recent_days: Windows ending less than this number of days ago are never served from disk.
+    :param resume: Whether to serve the responses received by the previous (unfinished) run regardless of their window.
+    """
+    self.directory   = directory
+    self.max_size    = max_size_mb * 1024 * 1024
+    self.max_age     = max_age_days * 24 * 60 * 60
+    self.recent_days = recent_days
+    self.hits        = 0
+    self.misses      = 0
+    self.bypassed    = 0
+    self._lock       = threading.Lock()
+    os.makedirs(self.directory, exist_ok=True)
+    self.evict()
+    self.resumable_keys = self._read_progress() if resume else set()
+    if not resume:
+      self.finish()
+
+  def key(self, url, params):
+    """
+    Compute the key of a request.
+
+    :param url: Url of the request.
+    :param params: Query parameters of the request.
+    :return: Hex digest identifying the request.
+    """
+    params = { name: str(value) for name, value in (params or {}).items() if name not in self.ignored_params }
+    return hashlib.sha256(json.dumps([url, params], sort_keys=True).encode()).hexdigest()
+
+  def get(self, url, params, window_end):
+    """
+    Retrieve the cached body of a request.
+
+    :param url: Url of the request.
+    :param params: Query parameters of the request.
+    :param window_end: End of the time window covered by the request.
+    :return: The cached body, or None if the request must be performed.
+    """
+    key = self.key(url, params)
+    if not self.is_closed(window_end) and key not in self.resumable_keys:
+      self._count('bypassed')
+      return None
+    path = self._path(key)
+    try:
+      downloaded = datetime.fromtimestamp(os.stat(path).st_mtime) # The mtime is only set when the entry is stored
+      with open(path, 'r', encoding='utf-8') as f:
+        body = f.read()
+    except FileNotFoundError:
+      self._count('misses')
+      return None
+    if not self.is_closed(window_end, now=downloaded) and key not in self.resumable_keys:
+      # The response may have been preliminary, it is replaced by the one put after requesting it again
+      self._count('bypassed')
+      return None
+    os.utime(path, (time.time(), os.stat(path).st_mtime)) # Refresh the access time used by the size based eviction
+    self._count('hits')
+    return body
+
+  def put(self, url, params, body):
+    """
+    Store the body of a request.
+
+    :param url: Url of the request.
+    :param params: Query parameters of the request.
+    :param body: Text of the response.
+    """
+    key = self.key(url, params)
+    path = self._path(key)
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+      f.write(body)
+    os.replace(tmp_path, path)
+    with self._lock, open(self._path(self.progress_file), 'a') as f:
+      f.write(f'{key}\n')
+
+  def finish(self):
+    """
+    Mark the current run as completed, so its responses are not considered for resuming anymore.
+    """
+    if os.path.exists(self._path(self.progress_file)):
+      os.remove(self._path(self.progress_file))
+
+  def is_closed(self, window_end, now=None):
+    """
+    :param window_end: End of the time window covered by a request.
+    :param now: Time at which the window is considered [default is the current time].
+    :return: Whether the window ended more than recent_days before now, so the API does not update it anymore.
+    """
+    return window_end < (now or datetime.now()) - timedelta(days=self.recent_days)
+
+  def evict(self):
+    """
+    Remove the entries downloaded more than max_age ago and, then, the least recently
+    used ones until the cache fits in max_size.
+    """
+    now = time.time()
+    entries = []
+    for entry in os.scandir(self.directory):
+      if not entry.is_file() or entry.name == self.progress_file:
+        continue
+      stat = entry.stat()
+      if now - stat.st_mtime > self.max_age or entry.name.endswith('.tmp'):
+        os.remove(entry.path)
+      else:
+        entries.append((stat.st_atime, stat.st_size, entry.path))
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+      if total_size <= self.max_size:
+        break
+      os.remove(path)
+      total_size -= size
+
+  def summary(self):
+    return f"Cache: {self.hits} hits, {self.misses} misses, {self.bypassed} recent windows or preliminary responses requested again"
+
+  def _read_progress(self):
+    if not os.path.exists(self._path(self.progress_file)):
+      return set()
+    with open(self._path(self.progress_file), 'r') as f:
+      return set(f.read().split())
+
+  def _count(self, counter):
+    with self._lock:
+      setattr(self, counter, getattr(self, counter) + 1)
+
+  def _path(self, key):
+    return os.path.join(self.directory, key)
@@ -0,0 +1,44 @@
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+import telemetry_utils
+from utils import load_config
+from dataset_helpers import DatasetWrapper
+
+def main(args):
+  config = load_config()
+  store_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), config.get('RecurrentLSTMModel', 'WindowStoreDir')))
+  rows = 0
+  for input_file in args.input_files:
+    dataset = DatasetWrapper(
+      df_csv=os.path.abspath(input_file),
+      batch_size=config.getint('RecurrentLSTMModel', 'BatchSize'),
+      window_size=config.getint('RecurrentLSTMModel', 'WindowSize'),
+      countries_in_use=config.get('RecurrentLSTMModel', 'CountriesInUse').split(','),
+      country_hyperparams=config.get('RecurrentLSTMModel', 'CountryHyperparams').split(','),
+      store_dir=store_dir
+    )
+    rows += dataset.df_length
+    print(f"Windows of the {dataset.df_length} rows of {input_file} stored in {store_dir}")
+  telemetry_utils.record(rows=rows)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Prepares the windows fed to the model from the given files and stores them in the WindowStoreDir of the config, to be reused by the training and the prediction'
+  )
+  parser.add_argument(
+    '--input_files', '-i', type=str, nargs='+',
+    default=[os.path.join(os.path.dirname(__file__), '../data/processed_data.csv'), os.path.join(os.path.dirname(__file__), '../data/test.csv')],
+    help='the paths of the files whose windows will be stored [default is data/processed_data.csv and data/test.csv]'
+  )
+  parser.add_argument(
+    '--profile', action='store_true',
+    help='dump a cProfile of the run next to the telemetry file [default is False]'
+  )
+  args = parser.parse_args()
+  with telemetry_utils.stage('compile_dataset', profile=args.profile):
+    main(args)
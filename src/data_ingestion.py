@@ -1,27 +1,62 @@
 import os
 import sys
+import json
 import argparse
 import datetime
-import requests
 import pandas as pd
-import numpy as np
+from urllib.parse import urlsplit
 from dateutil.relativedelta import relativedelta
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
-from utils import load_config, inspect_dataframe
-from parse_utils import xmls_to_df_dict, jsons_to_df_dict
+import telemetry_utils
+from utils import load_config
+from parse_utils import xmls_to_data, jsons_to_data
+from cache_utils import ResponseCache
+from buffer_utils import WideBuffer
+from storage_utils import save_df, append_df, get_last_time
+from request_utils import RequestClient
 from constants import countries, regions
 
+all_types = ["B{:02d}".format(i) for i in range(1, 25)] + ['load']
+
 def main(args):
   """
-  Perform energy data ingestion from ENTSO-E API and store the data in a CSV file.
+  Perform energy data ingestion from ENTSO-E API and store the data in a file (CSV, Parquet or Feather).
 
   :param args: Command-line arguments.
   """
   config = load_config()
-  partial_dfs = [] # List to store intermediate DataFrames
-  df = pd.DataFrame()
+  workers = args.workers or config.getint('Ingestion', 'Workers')
+  entsoe_host = urlsplit(config.get('Common', 'ENTSOEAPIUrl')).netloc
+  elexon_host = urlsplit(config.get('Common', 'ElexonAPIUrl')).netloc
+  max_connections = {
+    entsoe_host: config.getint('Ingestion', 'EntsoeMaxConnections'),
+    elexon_host: config.getint('Ingestion', 'ElexonMaxConnections')
+  }
+  rate_limits = {
+    entsoe_host: config.getint('Ingestion', 'EntsoeRequestsPerMinute'),
+    elexon_host: config.getint('Ingestion', 'ElexonRequestsPerMinute')
+  }
+  cache = None if args.no_cache else ResponseCache(
+    directory=os.path.join(os.path.dirname(__file__), config.get('Ingestion', 'CacheDir')),
+    max_size_mb=config.getint('Ingestion', 'CacheMaxSizeMB'),
+    max_age_days=config.getint('Ingestion', 'CacheMaxAgeDays'),
+    recent_days=config.getint('Ingestion', 'CacheRecentDays'),
+    resume=args.resume
+  )
+  output_file = os.path.abspath(args.output_file)
+  append = args.append and os.path.exists(output_file)
+  if append:
+    # Only the tail starting at the day of the last stored timestamp is requested, as that day may be incomplete
+    append_start = get_last_time(output_file).floor('D')
+    args.start_time = append_start.tz_convert(None).to_pydatetime()
+    if args.start_time >= args.end_time:
+      print(f"{args.output_file} is already up to date")
+      return
+    print(f"Appending data from {append_start} to {args.output_file}")
+
+  sources = [] # List of (country, api, type, queries) tuples, one per country and document type
   for country in countries:
     print(f"Ingesting data for country {country}")
     params = {
@@ -30,145 +65,136 @@ def main(args):
     }
     if not args.only_entsoe and country == 'UK':
       params['url'] = config.get('Common', 'ElexonAPIUrl')
-      load_dict = get_UK_load_df_from_elexon(**params)
-      gen_dict  = get_UK_gen_df_from_elexon(**params)
+      sources.append((country, 'elexon', 'load',       get_UK_load_queries_from_elexon(**params)))
+      sources.append((country, 'elexon', 'generation', get_UK_gen_queries_from_elexon(**params)))
     else:
       params['url'] = config.get('Common', 'ENTSOEAPIUrl')
       params['token'] = config.get('Common', 'ENTSOEAPIToken')
       params['region'] = regions[country]
-      load_dict = get_region_load_df_from_entsoe(**params)
-      gen_dict  = get_region_gen_df_from_entsoe(**params)
-    for type, df in (load_dict | gen_dict).items():
-      partial_dfs.append((df, country, type))
-    
-  print("Concatenating all dataframes")
-  date_start = min([df.index.min() for df, _, _ in partial_dfs if not df.empty])
-  date_end = max([df.index.max() for df, _, _ in partial_dfs if not df.empty])
-  df = join_all_dfs(partial_dfs, date_start, date_end)
-  df = complete_df(df)
+      sources.append((country, 'entsoe', 'load',       get_region_load_queries_from_entsoe(**params)))
+      sources.append((country, 'entsoe', 'generation', get_region_gen_queries_from_entsoe(**params)))
+
+  # Responses are parsed as soon as they arrive, in order, and scattered into the preallocated table
+  # The table has a day of margin, as Elexon settlement days do not match UTC days
+  buffer = WideBuffer(
+    period_start=pd.Timestamp(args.start_time, tz='UTC') - relativedelta(days=1),
+    period_end=pd.Timestamp(args.end_time, tz='UTC') + relativedelta(days=1),
+    columns=[f'{country}_{type}' for country in countries for type in all_types]
+  )
+  chunks = [(country, api, type) for country, api, type, queries in sources for _ in queries]
+  queries = [query for _, _, _, queries in sources for query in queries]
+  client = RequestClient(
+    max_workers=workers,
+    max_connections=max_connections,
+    rate_limits=rate_limits,
+    max_retries=config.getint('Ingestion', 'MaxRetries'),
+    backoff_seconds=config.getfloat('Ingestion', 'BackoffSeconds'),
+    timeout=(config.getfloat('Ingestion', 'ConnectTimeout'), config.getfloat('Ingestion', 'ReadTimeout')),
+    cache=cache
+  )
+  try:
+    with client:
+      for (country, api, type), body in zip(chunks, client.iter_all(queries)):
+        buffer.write(country, parse_response(body, api, type))
+  finally:
+    print(client.metrics.summary())
+    if cache is not None:
+      print(cache.summary())
+
+  print("Building the dataframe")
+  last_time = buffer.last_time()
+  if last_time is None or (append and last_time < append_start):
+    print(f"No new data to append to {args.output_file}")
+    return
+  df = buffer.to_df(start=append_start if append else None, drop_empty_rows=args.drop_empty_rows)
   print(df)
-  save_df(df, filePath=os.path.abspath(args.output_file))
-  inspect_dataframe(df, args.output_file) # Monitors csv content
+  if append:
+    append_df(df, filePath=output_file, first_time=append_start)
+  else:
+    save_df(df, filePath=output_file)
+  if cache is not None:
+    cache.finish()
+  telemetry_utils.record(rows=len(df), columns=df.shape[1])
+
+@telemetry_utils.timed
+def parse_response(body, api, type):
+  """
+  Parse the body of a single response.
 
-def get_region_load_df_from_entsoe(url, token, region, period_start, period_end):
+  :param body: Text of the response.
+  :param api: Either 'entsoe' or 'elexon'.
+  :param type: Either 'load' or 'generation'.
+  :return: Dictionary with the long Time, Type and quantity arrays.
+  """
+  if api == 'elexon':
+    return jsons_to_data([json.loads(body)], type=type)
+  else:
+    return xmls_to_data([body], type=type)
+
+def get_region_load_queries_from_entsoe(url, token, region, period_start, period_end):
   params = {
     'securityToken': token, 
     'documentType': 'A65',
     'processType': 'A16',
     'outBiddingZone_Domain': region
   }
-  xmls = []
+  queries = []
   while (period_start < period_end):
     max_query_period_end = period_start+relativedelta(years=1)
     params['periodStart'] = (period_start).strftime('%Y%m%d%H%M')
     params['periodEnd']   = (max_query_period_end if period_end > max_query_period_end else period_end).strftime('%Y%m%d%H%M')
     print(f"\tRequesting load data from {url} from {params['periodStart']} to {params['periodEnd']}")
-    response = requests.get(url, params=params, headers=None)
-    if response.status_code == 200:
-      xmls.append(response.text)
-    else:
-      raise Exception(f"API request failed. Status code: {response.status_code}")
+    queries.append((url, dict(params), min(max_query_period_end, period_end)))
     period_start += relativedelta(years=1)
-  return xmls_to_df_dict(xmls, type='load')
+  return queries
 
-def get_region_gen_df_from_entsoe(url, token, region, period_start, period_end):
+def get_region_gen_queries_from_entsoe(url, token, region, period_start, period_end):
   params = {
     'securityToken': token, 
     'documentType': 'A75',
     'processType': 'A16',
     'in_Domain': region
   }
-  xmls = []
+  queries = []
   while (period_start < period_end):
     max_query_period_end = period_start+relativedelta(years=1)
     params['periodStart'] = (period_start).strftime('%Y%m%d%H%M')
     params['periodEnd']   = (max_query_period_end if period_end > max_query_period_end else period_end).strftime('%Y%m%d%H%M')
     print(f"\tRequesting generation data from {url} from {params['periodStart']} to {params['periodEnd']}")
-    response = requests.get(url, params=params, headers=None)
-    if response.status_code == 200:
-      xmls.append(response.text)
-    else:
-      raise Exception(f"API request failed. Status code: {response.status_code}")
+    queries.append((url, dict(params), min(max_query_period_end, period_end)))
     period_start += relativedelta(years=1)
-  return xmls_to_df_dict(xmls, type='generation')
+  return queries
 
-def get_UK_load_df_from_elexon(url, period_start, period_end):
+def get_UK_load_queries_from_elexon(url, period_start, period_end):
   params = {
     'format': 'json'
   }
-  jsons = []
+  queries = []
   period_end -= relativedelta(days=1) # Just remove the last day, as it is included in the response
-  while (period_start < period_end):
+  # A period of a single day (e.g. when appending to a file whose last row is on the last day) still requests that day
+  while (period_start < period_end or (not queries and period_start == period_end)):
     max_query_period_end = period_start+relativedelta(days=28)
     params['settlementDateFrom'] = (period_start).strftime('%Y-%m-%d')
     params['settlementDateTo']   = (max_query_period_end if period_end > max_query_period_end else period_end).strftime('%Y-%m-%d')
     print(f"\tRequesting load data from {url} from {params['settlementDateFrom']} to {params['settlementDateTo']}")
-    response = requests.get(f'{url}/demand', params=params, headers=None)
-    if response.status_code == 200:
-      jsons.append(response.json())
-    else:
-      raise Exception(f"API request failed. Status code: {response.status_code}")
+    queries.append((f'{url}/demand', dict(params), min(max_query_period_end, period_end)+relativedelta(days=1)))
     period_start += relativedelta(days=28)
-  return jsons_to_df_dict(jsons, type='load')
+  return queries
 
-def get_UK_gen_df_from_elexon(url, period_start, period_end):
+def get_UK_gen_queries_from_elexon(url, period_start, period_end):
   params = {
     'includeNegativeGeneration': False,
     'format': 'json'
   }
-  jsons = []
+  queries = []
   while (period_start < period_end):
     max_query_period_end = period_start+relativedelta(days=14)
     params['startTime'] = (period_start).strftime('%Y-%m-%d')
     params['endTime']   = (max_query_period_end if period_end > max_query_period_end else period_end).strftime('%Y-%m-%d')
     print(f"\tRequesting generation data from {url} from {params['startTime']} to {params['endTime']}")
-    response = requests.get(f'{url}/generation/outturn/summary', params=params, headers=None)
-    if response.status_code == 200:
-      jsons.append(response.json())
-    else:
-      raise Exception(f"API request failed. Status code: {response.status_code}")
+    queries.append((f'{url}/generation/outturn/summary', dict(params), min(max_query_period_end, period_end)))
     period_start += relativedelta(days=14)
-  return jsons_to_df_dict(jsons, type='generation')
-
-def join_all_dfs(partial_dfs, date_start, date_end):
-  """
-  Concatenate all intermediate DataFrames into a single structure.
-
-  :param dfs: List of tuples, each with an intermediate DataFrame and associated country/parameter information.
-  :return: Resulting DataFrame.
-  """
-  full_timestamp_range = pd.date_range(start=date_start, end=date_end, freq='15T')
-  for dfi, country, parameter in partial_dfs:
-    # Rename columns based on country and parameter information
-    new_column_name = f"{country}_{parameter}"
-    dfi.rename(columns={'quantity': new_column_name}, inplace=True)
-  entire_result = pd.concat([df[[f'{country}_{parameter}']] for df, country, parameter in partial_dfs], axis=1)
-  entire_result = entire_result.reindex(full_timestamp_range)
-  entire_result = pd.concat([entire_result, entire_result.index.to_frame(name='Time')], axis=1)
-  entire_result = entire_result.reset_index(drop=True)
-  return entire_result
-
-def complete_df(df):
-  all_types = ["B{:02d}".format(i) for i in range(1, 25)] + ['load']
-  new_columns = []
-  for country in countries:
-    for type in all_types:
-      new_column_name = f'{country}_{type}'
-      if new_column_name not in df.columns:
-        new_columns.append(pd.Series(name=new_column_name, dtype=np.float64))
-  if new_columns:
-    df = pd.concat([df] + new_columns, axis=1)
-
-  return df[['Time'] + sorted([col for col in df.columns if col != 'Time'])]
-
-def save_df(df, filePath):
-  """
-  Save the DataFrame to a CSV file.
-
-  :param df: DataFrame to be saved.
-  :param filePath: Path of the output CSV file.
-  """
-  df.to_csv(filePath, index=True)
+  return queries
 
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(
@@ -190,10 +216,36 @@ if __name__ == "__main__":
     '--only_entsoe', action='store_true',
     help='Use Elexon API for UK data [default is False]'
   )
+  parser.add_argument(
+    '--workers', '-w', type=int,
+    default=None,
+    help='number of concurrent requests, 1 runs the ingestion sequentially [default is Workers in config.ini]'
+  )
+  parser.add_argument(
+    '--no_cache', action='store_true',
+    help='Request every chunk again instead of using the on-disk response cache [default is False]'
+  )
+  parser.add_argument(
+    '--resume', '-r', action='store_true',
+    help='Reuse every response cached by the previous run, if it did not finish [default is False]'
+  )
+  parser.add_argument(
+    '--append', '-a', action='store_true',
+    help='Only ingest the data after the last timestamp of the output file and append it [default is False]'
+  )
+  parser.add_argument(
+    '--drop_empty_rows', action='store_true',
+    help='Only store the timestamps with at least one value instead of the whole 15 minute grid [default is False]'
+  )
   parser.add_argument(
     '--output_file', '-o', type=str,
     default=os.path.join(os.path.dirname(__file__), '../data/raw_data.csv'),
-    help='the path of the file where raw data will be saved [default is data/raw_data.csv]'
+    help='the path of the file where raw data will be saved, its extension (.csv, .parquet or .feather) sets the format [default is data/raw_data.csv]'
+  )
+  parser.add_argument(
+    '--profile', action='store_true',
+    help='dump a cProfile of the run next to the telemetry file [default is False]'
   )
   args = parser.parse_args()
-  main(args)
+  with telemetry_utils.stage('ingestion', profile=args.profile):
+    main(args)
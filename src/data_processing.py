@@ -1,48 +1,222 @@
 import os
 import sys
+import copy
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
-from utils import inspect_dataframe
+import storage_utils
+import telemetry_utils
+from utils import load_config
+from processing_utils import ProcessingState
+from parallel_utils import SharedArray
 from constants import (
   countries,
   renewable_energies,
   country_id_map
 )
 
+# Id of the country of each column of the (time, country, energy) arrays
+country_ids = np.array([country_id_map[country] for country in countries])
+# Columns of each country in the processed data
+country_features = ['green_energy', 'load', 'surplus']
+
 def main(args):
-  df = load_df(filePath=os.path.abspath(args.input_file))
-  df = drop_non_renewable_energy_columns(df)
-  df = clean_data(df)
-  df = compute_aggregates(df)
-  df = drop_renewable_energy_columns(df)
-  df = df[['Time'] + sorted([col for col in df.columns if col != 'Time'])]
+  if args.incremental:
+    process_incrementally(os.path.abspath(args.input_file), os.path.abspath(args.output_file), args.chunk_size or 65536)
+    return
+  if args.chunk_size:
+    process_in_chunks(os.path.abspath(args.input_file), os.path.abspath(args.output_file), args.chunk_size)
+    return
+  input_file = os.path.abspath(args.input_file)
+  df = load_df(filePath=input_file, columns=get_used_columns(input_file))
+  if args.workers > 1:
+    df = process_countries_in_parallel(df, args.workers)
+  else:
+    df = clean_data(df)
+    df = compute_country_features(df)
   df = compute_labels(df)
   print(df)
   save_df(df, filePath=os.path.abspath(args.output_file))
-  inspect_dataframe(df, args.output_file) # Monitors csv content
+  telemetry_utils.record(rows=len(df), columns=df.shape[1])
 
-def load_df(filePath):
-  df = pd.read_csv(filePath, index_col=0)
-  df['Time'] = pd.to_datetime(df['Time'])
-  numeric_cols = df.columns.difference(['id', 'Time'])
-  df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce', downcast='float')
-  return df
+def process_in_chunks(input_file, output_file, chunk_size):
+  """
+  Process the raw data in chunks of consecutive rows, writing the processed rows as soon as they are
+  finished, so the memory used is bounded by the chunk size (plus the longest gap of the series)
+  instead of the length of the data. The output is the same as the one of the in-memory path.
 
-def clean_data(df):
-  # Assume that the data starts at the beginning of an hour and is sampled in 15 minute intervals
-  startTime = df['Time'].min()
-  df = df.drop(columns=['Time'])
+  :param input_file: Path of the raw data, sorted by Time.
+  :param output_file: Path of the processed data.
+  :param chunk_size: Number of raw rows loaded at once.
+  """
+  state = ProcessingState()
+  # A first pass finds the first and last values of each series, so the rows before and after them can be finished right away
+  for df in iter_hourly_chunks(input_file, chunk_size, state):
+    state.observe(df)
+  with storage_utils.DataFrameWriter(output_file) as writer:
+    for df in iter_hourly_chunks(input_file, chunk_size, state):
+      state.add_hours(df)
+      write_finished_hours(state, writer)
+    write_finished_hours(state, writer, final=True)
+  telemetry_utils.record(rows=state.rows_written)
+  print(f"Processed {state.rows_written} rows into {output_file}")
+
+def process_incrementally(input_file, output_file, chunk_size):
+  """
+  Process only the raw rows appended since the previous run, appending the rows they finish to the
+  processed data, so refreshing it takes a time proportional to the new data. The state at the
+  boundary (the last raw hour, the hourly rows with open gaps, the last values before them and the
+  unlabelled last row) is kept next to the output file between runs. The first run, or any run
+  without the state or the output file, processes the whole raw data.
+
+  The ingestion appends by rewriting the raw rows from the start of the day of its last stored row, so
+  the state is saved at the start of the day of the last raw row, before any row that may be rewritten.
+  The next run resumes from there, replacing the processed rows written after it.
+
+  The rows with open gaps are only written once they are closed, or once they are longer than
+  MaxGapHours in config.ini, so the output may lag behind the raw data.
+
+  :param input_file: Path of the raw data, sorted by Time.
+  :param output_file: Path of the processed data.
+  :param chunk_size: Number of raw rows loaded at once.
+  """
+  state_file = f'{output_file}.state'
+  is_first_run = not (os.path.exists(state_file) and os.path.exists(output_file))
+  if is_first_run:
+    state = ProcessingState(open_ended=True, max_gap_hours=load_config().getint('Processing', 'MaxGapHours'))
+  else:
+    state = ProcessingState.load(state_file)
+  rows_kept = state.rows_written
+  rewrite_day = storage_utils.get_last_time(input_file).floor('D')
+  saved_state = None
+  with storage_utils.DataFrameWriter(output_file, append=not is_first_run, kept_rows=rows_kept) as writer:
+    for df in iter_chunks(input_file, chunk_size, columns=get_used_columns(input_file), after=state.last_raw_time):
+      if state.start_time is None:
+        state.start_time = df['Time'].min()
+      # Start of the hour that contains the first raw row that may be rewritten
+      resume_time = state.start_time + (rewrite_day - state.start_time) // state.hour * state.hour
+      for rows in [df[df['Time'] < resume_time], df[df['Time'] >= resume_time]]:
+        if saved_state is None and len(rows) and rows['Time'].iloc[0] >= resume_time:
+          saved_state = copy.deepcopy(state)
+        add_raw_rows(state, rows, writer)
+  if saved_state is None: # No raw row after the ones of the previous run
+    saved_state = state
+  saved_state.save(state_file)
+  telemetry_utils.record(rows=state.rows_written - rows_kept)
+  print(f"Processed {state.rows_written - rows_kept} new rows into {output_file}, resuming from {saved_state.rows_written} rows in the next run")
+
+def add_raw_rows(state, df, writer):
+  if not len(df):
+    return
+  df = state.split_hours(df)
+  if len(df):
+    df = resample(df, freq='1H', start=state.start_time)
+    state.observe(df)
+    state.add_hours(df)
+    write_finished_hours(state, writer)
+
+def iter_hourly_chunks(filePath, chunk_size, state):
+  """
+  Load the raw data in chunks and resample them to complete hours, the last hour of each chunk is held in the state.
+
+  :param filePath: Path of the raw data.
+  :param chunk_size: Number of raw rows loaded at once.
+  :param state: ProcessingState of the run.
+  :return: Generator of DataFrames with the hourly rows, as resample returns them.
+  """
+  for df in iter_chunks(filePath, chunk_size, columns=get_used_columns(filePath)):
+    df = state.split_hours(df)
+    if len(df):
+      yield resample(df, freq='1H', start=state.start_time)
+  df = state.flush_partial_hour()
+  if df is not None and len(df):
+    yield resample(df, freq='1H', start=state.start_time)
 
-  # Now we can resample the data to 1 hour intervals by averaging the existing values
-  df_resampled = df.groupby((df.index) // 4 * 4).agg(lambda group: np.nan if all(group.isna()) else group.mean())
-  # Reset the index
-  df_resampled = df_resampled.reset_index(drop=True)
-  # And recreate the Time column with the new intervals
-  df_resampled['Time'] = startTime + pd.to_timedelta(df_resampled.index, unit='H')
+def write_finished_hours(state, writer, final=False):
+  df = state.pop_finished_hours(final=final)
+  if df is None:
+    return
+  df = compute_country_features(df)
+  df = compute_labels(state.hold_last_row(df))
+  writer.write(state.number_rows(df))
+
+@telemetry_utils.timed
+def process_countries_in_parallel(df, workers):
+  """
+  Clean the data and compute the features of each country in its own process, which is the same as
+  clean_data followed by compute_country_features, as every series is resampled and interpolated on
+  its own. The raw values and the features are exchanged through shared memory, not pickled.
+
+  :param df: Raw DataFrame with the Time column and the used columns of every country.
+  :param workers: Number of processes.
+  :return: DataFrame with the Time column and the load, green energy and surplus of every country.
+  """
+  start_time = df['Time'].min()
+  num_hours = (df['Time'].max() - start_time) // pd.Timedelta(hours=1) + 1
+  country_columns = {country: [col for col in df.columns if col.startswith(f'{country}_')] for country in countries}
+  columns = [col for country in countries for col in country_columns[country]]
+  with SharedArray((len(df),), 'int64') as times, \
+       SharedArray((len(columns), len(df)), storage_utils.value_dtype) as values, \
+       SharedArray((len(countries), len(country_features), num_hours), storage_utils.value_dtype) as features:
+    times.array[:] = df['Time'].array.asi8
+    # Each country reads its rows of the transposed values, which are contiguous
+    values.array[:] = df[columns].to_numpy(dtype=storage_utils.value_dtype).T
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      futures = []
+      first_row = 0
+      for index, country in enumerate(countries):
+        last_row = first_row + len(country_columns[country])
+        futures.append(executor.submit(
+          process_country, country, country_columns[country], index, (first_row, last_row), times.spec, values.spec, features.spec
+        ))
+        first_row = last_row
+      for future in futures:
+        future.result()
+    df_features = pd.DataFrame({
+      f'{country}_{feature}': features.array[index, feature_index].copy()
+      for index, country in enumerate(countries) for feature_index, feature in enumerate(country_features)
+    })
+  df_features = df_features[sorted(df_features.columns)]
+  df_features.insert(0, 'Time', pd.date_range(start_time, periods=num_hours, freq='1H'))
+  return df_features
+
+def process_country(country, columns, index, rows, times_spec, values_spec, features_spec):
+  """
+  Clean the raw data of a country and compute its features, in a worker process.
+
+  :param country: Country code.
+  :param columns: Raw columns of the country.
+  :param index: Position of the country in the features array.
+  :param rows: First and last (excluded) rows of the country in the transposed raw values.
+  :param times_spec: Spec of the shared array with the raw timestamps, in nanoseconds since the epoch.
+  :param values_spec: Spec of the shared array with the transposed raw values.
+  :param features_spec: Spec of the shared (country, feature, time) array where the features are written.
+  """
+  with SharedArray.attach(times_spec) as times, SharedArray.attach(values_spec) as values, SharedArray.attach(features_spec) as features:
+    df = pd.DataFrame(values.array[rows[0]:rows[1]].T, columns=columns, copy=True)
+    df.insert(0, 'Time', pd.to_datetime(times.array, utc=True))
+    df = compute_aggregates(clean_data(df), countries=[country])
+    features.array[index] = df[[f'{country}_{feature}' for feature in country_features]].to_numpy().T
+
+def get_used_columns(filePath):
+  # Only the load and the renewable generation of each country are used, so the non renewable columns are not even read
+  used_columns = ['Time'] + [f'{country}_{type}' for country in countries for type in renewable_energies + ['load']]
+  return [col for col in storage_utils.get_columns(filePath) if col in used_columns]
+
+def load_df(filePath, columns=None):
+  return storage_utils.load_df(filePath, columns=columns)
+
+def iter_chunks(filePath, chunk_size, columns=None, after=None):
+  return storage_utils.iter_df(filePath, chunk_size, columns=columns, after=after)
+
+@telemetry_utils.timed
+def clean_data(df):
+  # Resample the data to 1 hour intervals by averaging the existing values of each hour, counted from the first timestamp
+  df_resampled = resample(df, freq='1H')
 
   # Fill all the gaps at the middle, beggining or end of the data with linear interpolation (average of the previous and next values)
   df_resampled.interpolate(method='linear', limit_direction='both', inplace=True)
@@ -51,40 +225,94 @@ def clean_data(df):
 
   return df_resampled
 
-def compute_aggregates(df):
-  for country in countries:
-    green_energy_columns = [f'{country}_{renewable_energy}' for renewable_energy in renewable_energies]
-    # Compute the green energy and surplus for each country
-    df[f'{country}_green_energy'] = df[green_energy_columns].sum(axis=1)
-    df[f'{country}_surplus']      = df[f'{country}_green_energy'] - df[f'{country}_load']
-  return df
+@telemetry_utils.timed
+def resample(df, freq='1H', start=None):
+  """
+  Average the values of each series within every interval of the given frequency, ignoring the missing values.
+
+  The rows are assigned to the intervals by their Time, counted from the start, so the series may have
+  any resolution (e.g. 15, 30 or 60 minutes) and missing rows. Intervals without any value (including
+  the ones without rows) are left as NaN.
+
+  :param df: DataFrame with a Time column and numeric columns.
+  :param freq: Resolution of the resampled data.
+  :param start: Timestamp where the first interval starts [default is the first timestamp of df].
+  :return: DataFrame with one row per interval from the first to the last one of df, the same columns and a RangeIndex.
+  """
+  startTime = df['Time'].min() if start is None else start
+  intervals = ((df['Time'] - startTime) // pd.Timedelta(freq)).to_numpy()
+  order = None if (np.diff(intervals) >= 0).all() else np.argsort(intervals, kind='stable')
+  if order is not None:
+    intervals = intervals[order]
+  # The rows of each interval are contiguous, so they are reduced at once from the first row of each one
+  interval_starts = np.flatnonzero(np.diff(intervals, prepend=-1))
+  first_interval = intervals[0] if len(intervals) else 0
+  num_intervals = intervals[-1] - first_interval + 1 if len(intervals) else 0
+  columns = df.columns.drop('Time')
+  dfs_resampled = []
+  # Each dtype is averaged separately, so float32 columns are not upcasted
+  for dtype, dtype_columns in columns.groupby(df[columns].dtypes).items():
+    values = df[dtype_columns].to_numpy(dtype=dtype)
+    if order is not None:
+      values = values[order]
+    is_present = ~np.isnan(values)
+    means = np.full((num_intervals, len(dtype_columns)), np.nan, dtype=dtype)
+    if len(values):
+      sums = np.add.reduceat(np.where(is_present, values, 0), interval_starts, axis=0)
+      counts = np.add.reduceat(is_present, interval_starts, axis=0, dtype=dtype)
+      with np.errstate(invalid='ignore', divide='ignore'):
+        means[intervals[interval_starts] - first_interval] = sums / counts # 0/0 is NaN for the intervals without any value
+    dfs_resampled.append(pd.DataFrame(means, columns=dtype_columns))
+  df_resampled = pd.concat(dfs_resampled, axis=1)[columns]
+  df_resampled['Time'] = pd.date_range(startTime + first_interval*pd.Timedelta(freq), periods=len(df_resampled), freq=freq)
+  return df_resampled
+
+@telemetry_utils.timed
+def compute_country_features(df):
+  df = compute_aggregates(df)
+  df = drop_renewable_energy_columns(df)
+  return df[['Time'] + sorted([col for col in df.columns if col != 'Time'])]
+
+def compute_aggregates(df, countries=countries):
+  energy = get_energy_tensor(df, countries)
+  # Compute the green energy and surplus of every country at once
+  green_energy = energy[:, :, :-1].sum(axis=2)
+  surplus      = green_energy - energy[:, :, -1]
+  aggregates = pd.DataFrame(
+    np.concatenate([green_energy, surplus], axis=1),
+    columns=[f'{country}_green_energy' for country in countries] + [f'{country}_surplus' for country in countries],
+    index=df.index
+  )
+  return pd.concat([df, aggregates], axis=1)
+
+def get_energy_tensor(df, countries=countries):
+  """
+  Gather the renewable generation and the load of every country in a single array.
+
+  :param df: Hourly DataFrame with the {country}_{renewable_energy} and {country}_load columns.
+  :param countries: Countries to gather [default is all of them].
+  :return: Array of shape (time, country, energy), in the order of countries and renewable_energies, the load being the last energy.
+  """
+  columns = [f'{country}_{energy}' for country in countries for energy in renewable_energies + ['load']]
+  return df[columns].to_numpy().reshape(len(df), len(countries), len(renewable_energies)+1)
 
 def drop_renewable_energy_columns(df):
   columns_to_drop = [f'{country}_{renewable_energy}' for country in countries for renewable_energy in renewable_energies]
   return df.drop(columns=columns_to_drop)
 
-def drop_non_renewable_energy_columns(df):
-  # non renewable energies are those that start with {country}B?? and are not renewable_energies
-  columns_to_drop = [col for country in countries for col in df.columns if col.startswith(f'{country}_B') and col.split('_')[1] not in renewable_energies]
-  return df.drop(columns=columns_to_drop)
-
+@telemetry_utils.timed
 def compute_labels(df):
-  # Find the column with the maximum surplus for each row and assign the corresponding label
-  max_surplus_column = df[[f'{country}_surplus' for country in countries]].idxmax(axis=1)
-  df['label'] = max_surplus_column.apply(lambda col_name: country_id_map[col_name.split('_')[0]])
-  
-  # We are predicting the surplus for the next hour, so we need to shift the labels one row up
-  df['label'] = df['label'].shift(-1)
-  # And drop the last row, which has no label
-  df = df.drop(df.index[-1])
-
-  # Convert the label to int
-  df['label'] = df['label'].astype(int)
+  # Find the country with the maximum surplus for each row and assign its id as the label
+  surplus = df[[f'{country}_surplus' for country in countries]].to_numpy()
+  labels = country_ids[surplus.argmax(axis=1)]
 
-  return df
+  # We are predicting the surplus for the next hour, so the label of each row is the one of the next row,
+  # and the last row, which has no label, is dropped.
+  # The label has the compact int dtype of the country ids
+  return df.iloc[:-1].assign(label=labels[1:].astype(storage_utils.label_dtype))
 
 def save_df(df, filePath):
-  df.to_csv(filePath, index=True)
+  storage_utils.save_df(df, filePath)
 
 if __name__ == "__main__":
   parser = argparse.ArgumentParser(
@@ -93,12 +321,31 @@ if __name__ == "__main__":
   parser.add_argument(
     '--input_file', '-i', type=str,
     default=os.path.join(os.path.dirname(__file__), '../data/raw_data.csv'),
-    help='the path of the file where raw data is stored [default is data/raw_data.csv]'
+    help='the path of the file where raw data is stored (.csv, .parquet or .feather) [default is data/raw_data.csv]'
   )
   parser.add_argument(
     '--output_file', '-o', type=str,
     default=os.path.join(os.path.dirname(__file__), '../data/processed_data.csv'),
-    help='the path of the file where processed data will be saved [default is data/processed_data.csv]'
+    help='the path of the file where processed data will be saved, its extension (.csv, .parquet or .feather) sets the format [default is data/processed_data.csv]'
+  )
+  parser.add_argument(
+    '--chunk_size', '-c', type=int,
+    default=None,
+    help='process the raw data in chunks of this number of rows, writing the output incrementally [default is processing it at once]'
+  )
+  parser.add_argument(
+    '--workers', '-w', type=int,
+    default=1,
+    help='process the countries in parallel in this number of processes, not used with --chunk_size [default is 1]'
+  )
+  parser.add_argument(
+    '--incremental', action='store_true',
+    help='only process the raw rows appended since the previous incremental run and append the finished rows to the output file, keeping the state between runs in <output_file>.state [default is False]'
+  )
+  parser.add_argument(
+    '--profile', action='store_true',
+    help='dump a cProfile of the run next to the telemetry file [default is False]'
   )
   args = parser.parse_args()
-  main(args)
\ No newline at end of file
+  with telemetry_utils.stage('processing', profile=args.profile):
+    main(args)
\ No newline at end of file
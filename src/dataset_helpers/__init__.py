@@ -1 +1,2 @@
-from .dataset_wrapper import DatasetWrapper
\ No newline at end of file
+from .dataset_wrapper import DatasetWrapper
+from .window_store import WindowStore
\ No newline at end of file
@@ -1,26 +1,77 @@
 import numpy as np
 import pandas as pd
-from keras.utils import to_categorical
+import tensorflow as tf
+from numpy.lib.stride_tricks import sliding_window_view
 
+import telemetry_utils
 from constants import countries
+from storage_utils import load_df, get_columns, compact_dtypes, value_dtype
+from .window_store import WindowStore
+
+# Cyclical time features, as the position of each timestamp in its cycle and the number of points of the cycle.
+# Each one adds the Time_<name>_x and Time_<name>_y columns, fed to the model when listed in CountryHyperparams
+circular_time_features = {
+  'hour':  (lambda time: time.hour,      24),
+  'week':  (lambda time: time.weekday,    7),
+  'month': (lambda time: time.month - 1, 12),
+}
 
 class DatasetWrapper:
-  def __init__(self, df_csv, batch_size, window_size, countries_in_use, country_hyperparams, phase="inference"):
-    self.df = self._load_df(filePath=df_csv)
-    self.df_length           = len(self.df)
+  def __init__(self, df_csv, batch_size, window_size, countries_in_use, country_hyperparams, phase="inference", store_dir=None):
+    """
+    :param df_csv: Path of the processed file.
+    :param batch_size: Number of samples per batch.
+    :param window_size: Number of hours of every window.
+    :param countries_in_use: Countries fed to the model.
+    :param country_hyperparams: Columns of every country fed to the model, ending with these names.
+    :param phase: training to also return the one-hot labels of the samples, or inference [default is inference].
+    :param store_dir: Folder of the WindowStore where the prepared arrays are reused across runs [default is to prepare them every time].
+    """
     self.batch_size          = batch_size
     self.window_size         = window_size
     self.countries_in_use    = countries_in_use
     self.country_hyperparams = country_hyperparams
     self.phase               = phase
 
+    store = WindowStore(store_dir) if store_dir else None
+    if store is not None:
+      key = store.key(df_csv,
+        window_size=window_size,
+        countries_in_use=countries_in_use,
+        country_hyperparams=country_hyperparams,
+        circular_time_features={ name: num_points for name, (_, num_points) in circular_time_features.items() },
+        value_dtype=value_dtype
+      )
+    arrays = store.load(key) if store is not None else None
+    if arrays is None:
+      arrays = self._prepare_arrays(df_csv)
+      if store is not None:
+        store.save(key, *arrays)
+    self.features, self.labels = arrays
+    self.df_length = len(self.features) - self.window_size + 1
+
+    # View the window ending at every row as a (country, window, feature) sample without copying it
+    self.windows  = sliding_window_view(self.features, self.window_size, axis=0).transpose(0, 1, 3, 2)
+    self.one_hot  = np.eye(len(countries), dtype=value_dtype) # One-hot vector of each label
+
+  def _prepare_arrays(self, df_csv):
+    """
+    :return: The (time, country, feature) array fed to the model and the label of every row (None if the file has no labels).
+    """
+    df = self._load_df(filePath=df_csv, columns=self._get_used_columns(df_csv, self.countries_in_use, self.country_hyperparams))
+
     # Adapt hyperparameters to the input of the model
-    self.df = self._transform_to_circular_timevalues(self.df)
-    self.df = self._prepend_empty_rows(self.df, self.window_size-1)
+    df = self._transform_to_circular_timevalues(df)
+    df = self._prepend_empty_rows(df, self.window_size-1)
 
     # Split the dataframe into one dataframe per country
-    self.country_dfs = self._split_country_dfs(self.df, self.countries_in_use)
-    self.country_dfs = self._filter_unused_hyperparams(self.country_dfs, self.country_hyperparams)
+    country_dfs = self._split_country_dfs(df, self.countries_in_use)
+    country_dfs = self._filter_unused_hyperparams(country_dfs, self.country_hyperparams)
+
+    # Gather them in a single contiguous (time, country, feature) array
+    features = np.stack([country_dfs[country].to_numpy(dtype=value_dtype) for country in self.countries_in_use], axis=1)
+    labels   = df['label'].to_numpy() if 'label' in df else None
+    return features, labels
   
   def get_train_test_split_iterables(self, validation_split=0.2, repeat=False):
     training_size = int(self.df_length*(1-validation_split))
@@ -29,9 +80,6 @@ class DatasetWrapper:
       self._get_iterable(training_size, self.df_length, repeat)
     )
 
-  def get_whole_dataset_iterable(self, repeat=False):
-    return self._get_iterable(0, self.df_length, repeat)
-
   def _get_iterable(self, it_start_index, it_end_index, repeat):
     continue_looping = True
     while continue_looping:
@@ -46,54 +94,120 @@ class DatasetWrapper:
       if not repeat:
         continue_looping = False
   
-  def _process_batch(self, start_index, end_index):
-    batch = np.empty(shape=(self.batch_size, len(self.countries_in_use), self.window_size, len(self.country_hyperparams)-1))
+  def get_train_test_split_datasets(self, validation_split=0.2, repeat=False, cache=None):
+    """
+    Same split and batches as get_train_test_split_iterables, as tf.data pipelines that prepare the next batches
+    in parallel while the model runs the current one.
+
+    :param validation_split: Fraction of the rows, at the end of the data, used for validation [default is 0.2].
+    :param repeat: Whether to repeat the batches indefinitely [default is False].
+    :param cache: None to prepare the batches in every epoch, 'memory' to keep them in memory after the first one,
+                  or the path prefix of the files to keep them on disk [default is None]. Existing cache files are read
+                  as they are, so the prefix must be specific to the data and the parameters of the wrapper.
+    :return: Training and validation tf.data.Dataset.
+    """
+    training_size = int(self.df_length*(1-validation_split))
+    return (
+      self._get_dataset(0,             training_size , repeat, self._get_cache_file(cache, 'training')),
+      self._get_dataset(training_size, self.df_length, repeat, self._get_cache_file(cache, 'validation'))
+    )
+
+  def get_windows_dataset(self, batch_size=None):
+    """
+    Window ending at every row of the data, without padding, for models that accept batches of any size.
+
+    :param batch_size: Number of windows per batch, the last batch has the remaining ones [default is the batch_size of the wrapper].
+    :return: tf.data.Dataset of (sample, country, window, feature) batches, whose samples are the rows of the data in order.
+    """
+    # The row of the first sample is the last of the empty rows prepended to the data
+    samples = tf.data.Dataset.range(self.window_size-1, self.window_size-1+self.df_length)
+    dataset = samples.batch(batch_size or self.batch_size).map(
+      self._gather_windows,
+      num_parallel_calls=tf.data.AUTOTUNE, deterministic=True
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+  def _get_dataset(self, it_start_index, it_end_index, repeat, cache_file):
+    # The samples, the rows where their windows end, in the same order and batches as _get_iterable
+    samples = tf.data.Dataset.range(it_start_index+self.window_size, it_end_index+self.window_size-1)
+    dataset = samples.batch(self.batch_size).map(
+      self._gather_batch,
+      num_parallel_calls=tf.data.AUTOTUNE, deterministic=True
+    )
+    if cache_file is not None:
+      dataset = dataset.cache(cache_file)
+    if repeat:
+      dataset = dataset.repeat()
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+  def _gather_batch(self, sample_indexes):
+    num_samples = tf.shape(sample_indexes)[0]
+    batch = self._gather_windows(sample_indexes)
+    # The rows after the last sample of an incomplete batch are zeros, so every batch has batch_size rows
+    batch = tf.pad(batch, [[0, self.batch_size-num_samples], [0, 0], [0, 0], [0, 0]])
+    batch = tf.ensure_shape(batch, (self.batch_size,) + self.windows.shape[1:])
     if self.phase == "training":
-      batch_labels = np.empty(shape=(self.batch_size, len(countries)))
-    for batch_index, sample_index in enumerate(range(start_index, end_index)):
-      for country in self.countries_in_use:
-        country_window = self.country_dfs[country].iloc[sample_index-self.window_size+1 : sample_index+1]
-        batch[batch_index, self.countries_in_use.index(country)] = country_window.values.reshape(self.window_size, -1)
-      if self.phase == "training":
-        batch_labels[batch_index] = to_categorical(int(self.df.iloc[sample_index]["label"]), num_classes=len(countries))
+      labels = tf.numpy_function(lambda indexes: self.labels[indexes].astype(np.int32), [sample_indexes], tf.int32, stateful=False)
+      batch_labels = tf.pad(tf.one_hot(labels, len(countries), dtype=batch.dtype), [[0, self.batch_size-num_samples], [0, 0]])
+      return batch, tf.ensure_shape(batch_labels, (self.batch_size, len(countries)))
+    else:
+      return batch
+
+  def _gather_windows(self, sample_indexes):
+    # The windows are copied from the views of the (possibly memory-mapped) feature array one batch at a time,
+    # so the array is never loaded whole into a tensor; the window of each sample starts window_size-1 rows before it
+    windows = tf.numpy_function(lambda indexes: self.windows[indexes-self.window_size+1], [sample_indexes], tf.as_dtype(self.features.dtype), stateful=False)
+    return tf.ensure_shape(windows, (None,) + self.windows.shape[1:]) # (sample, country, window, feature)
+
+  @staticmethod
+  def _get_cache_file(cache, split):
+    if cache is None:
+      return None
+    return '' if cache == 'memory' else f'{cache}-{split}'
+
+  @telemetry_utils.timed
+  def _process_batch(self, start_index, end_index):
+    # The rows after the last sample of an incomplete batch are left as zeros
+    batch = np.zeros(shape=(self.batch_size, len(self.countries_in_use), self.window_size, len(self.country_hyperparams)-1), dtype=value_dtype)
+    # The window of each sample ends at its row, so it is the one starting window_size-1 rows before
+    batch[:end_index-start_index] = self.windows[start_index-self.window_size+1 : end_index-self.window_size+1]
     if self.phase == "training":
+      batch_labels = np.zeros(shape=(self.batch_size, len(countries)), dtype=value_dtype)
+      batch_labels[:end_index-start_index] = self.one_hot[self.labels[start_index:end_index]]
       return batch, batch_labels
     else:
       return batch
 
   @staticmethod
-  def _load_df(filePath):
-    df = pd.read_csv(filePath, index_col=0)
-    df['Time'] = pd.to_datetime(df['Time'])
-    return df
+  def _load_df(filePath, columns=None):
+    return load_df(filePath, columns=columns)
 
   @staticmethod
-  def _transform_to_circular_timevalues(df):
-    df['Time_hour_x'],  df['Time_hour_y']  = zip(*df.apply(lambda row: DatasetWrapper._calculate_circular_coordinates(row['Time'], 'hour' ), axis=1))
-    df['Time_week_x'],  df['Time_week_y']  = zip(*df.apply(lambda row: DatasetWrapper._calculate_circular_coordinates(row['Time'], 'week' ), axis=1))
-    df['Time_month_x'], df['Time_month_y'] = zip(*df.apply(lambda row: DatasetWrapper._calculate_circular_coordinates(row['Time'], 'month'), axis=1))
-    return df.drop(columns=['Time'])
+  def _get_used_columns(filePath, countries_in_use, hyperparams):
+    # Only the columns of the countries in use that end with any of the hyperparams are fed to the model
+    return [
+      col for col in get_columns(filePath)
+      if col in ('Time', 'label') or (col.startswith(tuple(countries_in_use)) and col.endswith(tuple(hyperparams)))
+    ]
 
   @staticmethod
-  def _calculate_circular_coordinates(timestamp, stage):
-    if stage == 'hour':
-      return DatasetWrapper._circular_coordinates(24)[timestamp.hour]
-    elif stage == 'week':
-      return DatasetWrapper._circular_coordinates(7)[timestamp.weekday()]
-    elif stage == 'month':
-      return DatasetWrapper._circular_coordinates(12)[timestamp.month-1]
-    else:
-      raise ValueError(f"Invalid stage: {stage}")
-  
+  @telemetry_utils.timed
+  def _transform_to_circular_timevalues(df):
+    time = pd.DatetimeIndex(df['Time'])
+    for name, (get_position, num_points) in circular_time_features.items():
+      # Every timestamp is mapped at once to the point of the circle of its position in the cycle
+      df[f'Time_{name}_x'], df[f'Time_{name}_y'] = DatasetWrapper._circular_coordinates(num_points)[np.asarray(get_position(time))].T
+    return compact_dtypes(df.drop(columns=['Time']))
+
   @staticmethod
-  def _circular_coordinates(num_points): # TODO not generate the entire array, as it is not needed
+  def _circular_coordinates(num_points):
     radians = np.linspace(0, 2*np.pi, num_points, endpoint=False)
     return np.column_stack((np.cos(radians), np.sin(radians)))
   
   @staticmethod
   def _prepend_empty_rows(df, num_rows):
     # Add num_rows to the beggining of the dataframe and recalculate the index
-    return pd.concat([pd.DataFrame(np.zeros((num_rows, df.shape[1])), columns=df.columns), df], ignore_index=True)
+    return pd.concat([pd.DataFrame(0, index=pd.RangeIndex(num_rows), columns=df.columns).astype(df.dtypes), df], ignore_index=True)
 
   @staticmethod
   def _split_country_dfs(df, countries):
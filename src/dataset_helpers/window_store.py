@@ -0,0 +1,78 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+class WindowStore:
+  """
+  On-disk store of the arrays DatasetWrapper prepares from a processed file: the (time, country, feature)
+  array, with the time features encoded and the empty rows prepended, and the labels.
+
+  Every entry is keyed by the content of the file and the parameters that shape the arrays, and is
+  memory-mapped when loaded, so the processes that use the same data share its pages instead of each
+  one reading and preparing its own copy. The windows are views of the memory-mapped array.
+  """
+  version = 1 # Increase it when the preparation of the arrays changes, to invalidate the stored ones
+
+  def __init__(self, directory):
+    """
+    :param directory: Folder where the entries are stored.
+    """
+    self.directory = directory
+    os.makedirs(self.directory, exist_ok=True)
+
+  def key(self, filePath, **params):
+    """
+    Compute the key of the arrays prepared from a file.
+
+    :param filePath: Path of the processed file.
+    :param params: Parameters that shape the arrays, e.g. window_size, countries_in_use or country_hyperparams.
+    :return: Hex digest identifying the arrays.
+    """
+    digest = hashlib.sha256()
+    with open(filePath, 'rb') as f:
+      for block in iter(lambda: f.read(1 << 20), b''):
+        digest.update(block)
+    description = { 'version': self.version, 'data': digest.hexdigest(), 'params': params }
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+
+  def load(self, key):
+    """
+    Memory-map the arrays of an entry.
+
+    :param key: Key of the entry.
+    :return: Read-only (features, labels) arrays, labels being None if the file had none, or None if the entry is not stored.
+    """
+    path = self._path(key)
+    if not os.path.isdir(path):
+      return None
+    features = np.load(os.path.join(path, 'features.npy'), mmap_mode='r')
+    labels_file = os.path.join(path, 'labels.npy')
+    labels = np.load(labels_file, mmap_mode='r') if os.path.exists(labels_file) else None
+    return features, labels
+
+  def save(self, key, features, labels=None):
+    """
+    Store the arrays of an entry. They are written to a temporary folder which is then renamed, so
+    concurrent runs never read a partial entry.
+
+    :param key: Key of the entry.
+    :param features: (time, country, feature) array.
+    :param labels: Label of every row, if any [default is None].
+    """
+    directory = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+    try:
+      np.save(os.path.join(directory, 'features.npy'), features)
+      if labels is not None:
+        np.save(os.path.join(directory, 'labels.npy'), labels)
+      os.replace(directory, self._path(key))
+    except OSError:
+      # Another run stored the same entry meanwhile
+      shutil.rmtree(directory, ignore_errors=True)
+      if not os.path.isdir(self._path(key)):
+        raise
+
+  def _path(self, key):
+    return os.path.join(self.directory, key)
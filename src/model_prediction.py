@@ -6,21 +6,32 @@ import argparse
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
+import telemetry_utils
+from utils import load_config
 from dataset_helpers import DatasetWrapper
 
 def main(args):
   model = load_model(args.model_type, args.model_file)
-  data = DatasetWrapper(
-    df_csv=os.path.abspath(args.input_file),
-    batch_size=model.batch_size,
-    window_size=model.window_size,
-    countries_in_use=model.countries_in_use,
-    country_hyperparams=model.country_hyperparams,
-    phase="inference"
-  )
-  predictions = model.predict(data)
+  with telemetry_utils.stage('windowing'):
+    data = DatasetWrapper(
+      df_csv=os.path.abspath(args.input_file),
+      batch_size=model.batch_size,
+      window_size=model.window_size,
+      countries_in_use=model.countries_in_use,
+      country_hyperparams=model.country_hyperparams,
+      phase="inference",
+      store_dir=get_window_store_dir(args)
+    )
+    telemetry_utils.record(rows=data.df_length)
+  predictions = model.predict(data, batch_size=args.batch_size)
+  telemetry_utils.record(rows=len(predictions))
   save_predictions(predictions, args.output_file)
 
+def get_window_store_dir(args):
+  if args.no_window_store:
+    return None
+  return os.path.join(os.path.dirname(__file__), load_config().get('RecurrentLSTMModel', 'WindowStoreDir'))
+
 def load_model(model_type, model_path):
   if model_type == "recurrentLSTM":
     from models import RecurrentLSTMModel
@@ -68,5 +79,19 @@ if __name__ == "__main__":
     default='nil',
     help='the path of the file where the ground truth is stored (to generate f1-score-macro) [default is nil]'
   )
+  parser.add_argument(
+    '--batch_size', '-b', type=int,
+    default=None,
+    help='the number of windows predicted at once, larger batches predict bulk data faster [default is BatchSize in config.ini]'
+  )
+  parser.add_argument(
+    '--no_window_store', action='store_true',
+    help='prepare the windows from the input file instead of reusing the ones in the WindowStoreDir of the config [default is False]'
+  )
+  parser.add_argument(
+    '--profile', action='store_true',
+    help='dump a cProfile of the run next to the telemetry file [default is False]'
+  )
   args = parser.parse_args()
-  main(args)
\ No newline at end of file
+  with telemetry_utils.stage('prediction', profile=args.profile):
+    main(args)
\ No newline at end of file
@@ -5,21 +5,32 @@ import argparse
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
+import telemetry_utils
+from utils import load_config
 from dataset_helpers import DatasetWrapper
 
 def main(args):
   model = load_model(args.model_type)
-  dataset = DatasetWrapper(
-    df_csv=os.path.abspath(args.input_file),
-    batch_size=model.batch_size,
-    window_size=model.window_size,
-    countries_in_use=model.countries_in_use,
-    country_hyperparams=model.country_hyperparams,
-    phase="training"
-  )
-  model.train(dataset)
+  with telemetry_utils.stage('windowing'):
+    dataset = DatasetWrapper(
+      df_csv=os.path.abspath(args.input_file),
+      batch_size=model.batch_size,
+      window_size=model.window_size,
+      countries_in_use=model.countries_in_use,
+      country_hyperparams=model.country_hyperparams,
+      phase="training",
+      store_dir=get_window_store_dir(args)
+    )
+    telemetry_utils.record(rows=dataset.df_length)
+  telemetry_utils.record(rows=dataset.df_length)
+  model.train(dataset, cache=args.cache)
   model.save(os.path.abspath(args.model_file))
 
+def get_window_store_dir(args):
+  if args.no_window_store:
+    return None
+  return os.path.join(os.path.dirname(__file__), load_config().get('RecurrentLSTMModel', 'WindowStoreDir'))
+
 def load_model(model_type):
   if model_type == "recurrentLSTM":
     from models import RecurrentLSTMModel
@@ -47,5 +58,19 @@ if __name__ == "__main__":
     default=os.path.join(os.path.dirname(__file__), '../data/processed_data.csv'),
     help='the path of the file where training data is stored [default is data/processed_data.csv]'
   )
+  parser.add_argument(
+    '--cache', '-c', type=str,
+    default=None,
+    help='keep the batches prepared in the first epoch in memory (memory) or in files with the given path prefix [default is to prepare them in every epoch]'
+  )
+  parser.add_argument(
+    '--no_window_store', action='store_true',
+    help='prepare the windows from the input file instead of reusing the ones in the WindowStoreDir of the config [default is False]'
+  )
+  parser.add_argument(
+    '--profile', action='store_true',
+    help='dump a cProfile of the run next to the telemetry file [default is False]'
+  )
   args = parser.parse_args()
-  main(args)
+  with telemetry_utils.stage('training', profile=args.profile):
+    main(args)
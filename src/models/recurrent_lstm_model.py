@@ -25,13 +25,14 @@ class RecurrentLSTMModel():
     self.learning_rate       = config.getfloat('RecurrentLSTMModel', 'LearningRate')
     self.countries_in_use    = config.get('RecurrentLSTMModel', 'CountriesInUse').split(',')
     self.country_hyperparams = config.get('RecurrentLSTMModel', 'CountryHyperparams').split(',')
+    self.inference_model     = None
     if filePath:
       self._load_model(filePath)
     else:
       self._create_model()
   
-  def train(self, dataset):
-    training, validation = dataset.get_train_test_split_iterables(self.validation_split, repeat=True)
+  def train(self, dataset, cache=None):
+    training, validation = dataset.get_train_test_split_datasets(self.validation_split, repeat=True, cache=cache)
     self.model.fit(training,
       epochs=self.num_epochs,
       steps_per_epoch=int(dataset.df_length*(1-self.validation_split)//self.batch_size),
@@ -39,13 +40,31 @@ class RecurrentLSTMModel():
       validation_steps=int(dataset.df_length*self.validation_split//self.batch_size),
       verbose=1
     )
+    self.inference_model = None # Rebuilt with the new weights when needed
 
-  def predict(self, dataset):
-    to_predict = dataset.get_whole_dataset_iterable(repeat=False)
-    prediction = self.model.predict(to_predict, verbose=1)
-    all_preds = [ int(np.argmax(vector)) for vector in prediction ]
-    all_preds = all_preds[:dataset.df_length]
-    return all_preds
+  def predict(self, dataset, batch_size=None):
+    """
+    Predict the label of every row of the dataset with the inference graph.
+
+    :param dataset: DatasetWrapper of the data.
+    :param batch_size: Number of windows predicted at once [default is BatchSize in config.ini].
+    :return: The predicted label of every row.
+    """
+    to_predict = dataset.get_windows_dataset(batch_size or self.batch_size)
+    prediction = self.get_inference_model().predict(to_predict, verbose=1)
+    return [ int(label) for label in np.argmax(prediction, axis=1) ]
+
+  def get_inference_model(self):
+    """
+    Rebuild the trained network as a stateless graph that accepts batches of any size, from a single window
+    to tens of thousands of them, and has the same weights.
+
+    :return: Keras model taking (sample, country, window, feature) batches.
+    """
+    if self.inference_model is None:
+      self.inference_model = self._build_network(batch_size=None, stateful=False)
+      self.inference_model.set_weights(self.model.get_weights())
+    return self.inference_model
 
   def save(self, filePath):
     pickle.dump(self.model, open(filePath, 'wb'))
@@ -54,12 +73,30 @@ class RecurrentLSTMModel():
     self.model = pickle.load(open(filePath, 'rb'))
   
   def _create_model(self):
+    self.model = self._build_network(batch_size=self.batch_size, stateful=True)
+    
+    if self.save_graphs: 
+      keras.utils.plot_model(self.model, show_shapes=True, to_file=os.path.join(os.path.dirname(__file__), '../../doc/lstm_structure.png'))
+   
+    #Compile
+    self.model.compile(
+      loss=CategoricalCrossentropy(), 
+      optimizer=Adam(learning_rate=self.learning_rate),
+      metrics=['accuracy']
+    )
+
+  def _build_network(self, batch_size, stateful):
+    """
+    :param batch_size: Fixed number of samples per batch, or None to accept any.
+    :param stateful: Whether the LSTMs keep their state between batches, which requires a fixed batch size.
+    :return: Uncompiled Keras model, whose layers are created in the same order for any arguments.
+    """
     input_shape = (len(self.countries_in_use), self.window_size, len(self.country_hyperparams)-1)
-    input_layer = Input(shape=input_shape, batch_size=self.batch_size)
+    input_layer = Input(shape=input_shape, batch_size=batch_size)
 
     per_country_nets = []
     for i in range(len(self.countries_in_use)):
-      country_net = self._create_country_network(input_layer[:, i, :, :], self.lstm_units)
+      country_net = self._create_country_network(input_layer[:, i, :, :], self.lstm_units, stateful)
       per_country_nets.append(country_net)
     
     combined_model = Concatenate()(per_country_nets)
@@ -76,22 +113,12 @@ class RecurrentLSTMModel():
     fused_dense4 = Dense(len(countries), activation="softmax")(fused_bn4)
 
     #Construct the final model
-    self.model = keras.models.Model(inputs=input_layer, outputs=fused_dense4)
-    
-    if self.save_graphs: 
-      keras.utils.plot_model(self.model, show_shapes=True, to_file=os.path.join(os.path.dirname(__file__), '../../doc/lstm_structure.png'))
-   
-    #Compile
-    self.model.compile(
-      loss=CategoricalCrossentropy(), 
-      optimizer=Adam(learning_rate=self.learning_rate),
-      metrics=['accuracy']
-    )
+    return keras.models.Model(inputs=input_layer, outputs=fused_dense4)
   
   @staticmethod
-  def _create_country_network(input_layer_segment, lstm_units):
+  def _create_country_network(input_layer_segment, lstm_units, stateful):
     country_mask = Masking(mask_value=0.0)(input_layer_segment)
-    country_lstm = LSTM(units=lstm_units, stateful=True)(country_mask)
+    country_lstm = LSTM(units=lstm_units, stateful=stateful)(country_mask)
     country_bn1 = BatchNormalization(axis=-1)(country_lstm)
     country_dense1 = Dense(600, activation = 'relu')(country_bn1)
     country_bn2 = BatchNormalization(axis=-1)(country_dense1)
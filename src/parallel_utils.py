@@ -0,0 +1,47 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+class SharedArray:
+  """
+  Numpy array in shared memory, so the worker processes read and write it in place instead of
+  receiving a pickled copy. The process that creates it unlinks it when closing it, the workers
+  attach to it by its spec and only close their view of it.
+  """
+
+  def __init__(self, shape, dtype, name=None):
+    """
+    :param shape: Shape of the array.
+    :param dtype: Dtype of the array.
+    :param name: Name of an existing shared array to attach to [default is to create a new one].
+    """
+    self.shape   = tuple(int(dim) for dim in shape)
+    self.dtype   = np.dtype(dtype)
+    self.owner   = name is None
+    size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+    self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+    self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.memory.buf)
+
+  @property
+  def spec(self):
+    """
+    :return: Picklable tuple that identifies the array, to attach to it from another process.
+    """
+    return (self.memory.name, self.shape, self.dtype.str)
+
+  @classmethod
+  def attach(cls, spec):
+    name, shape, dtype = spec
+    return cls(shape, dtype, name=name)
+
+  def close(self):
+    # Every view of the array must be released before closing the memory
+    self.array = None
+    self.memory.close()
+    if self.owner:
+      self.memory.unlink()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
@@ -1,63 +1,116 @@
+import io
+import numpy as np
 import pandas as pd
 import xml.etree.ElementTree as ET
 
 from constants import fuel_types
 
+# Elexon fuel types are decoded through the codes of a categorical, looking up their ENTSO-E type in an array
+fuel_type_categories = pd.CategoricalDtype(list(fuel_types))
+fuel_type_lookup     = np.array(list(fuel_types.values()), dtype=object)
+
 def xmls_to_df_dict(xmls, type):
+  return data_to_df_dict(xmls_to_data(xmls, type))
+
+def xmls_to_data(xmls, type):
+  """
+  Parse ENTSO-E documents into long records.
+
+  :param xmls: List with the text of the documents.
+  :param type: Either 'load' or 'generation'.
+  :return: Dictionary with the Time (nanoseconds since epoch), Type and quantity arrays.
+  """
   print(f"\tProcessing {type} data")
 
-  data = { "Time": [], "UnitName": [], "Type": [], "quantity": [] }
+  times, psr_types, quantities = [], [], []
 
   for xml in xmls:
-    root = ET.fromstring(xml)
-    namespace = { 'ns': root.tag.split('}', 1)[0][1:] }
-
-    for time_series in root.findall('.//ns:TimeSeries', namespace):
-      if type == 'generation':
-        psr_type = time_series.find('ns:MktPSRType/ns:psrType', namespace).text
-      unit_name = time_series.find('ns:quantity_Measure_Unit.name', namespace).text
-      if unit_name != 'MAW':
-        raise Exception(f"Unexpected unit: {unit_name}")
-      for period in time_series.findall('ns:Period', namespace):
-        start_time = pd.to_datetime(period.find('ns:timeInterval/ns:start', namespace).text)
-        resolution = int(period.find('ns:resolution', namespace).text.replace('PT', '').replace('M', ''))
-        for point in period.findall('ns:Point', namespace):
-          position = int(point.find('ns:position', namespace).text)
-          quantity = int(point.find('ns:quantity', namespace).text)
-          data['Time'].append(start_time + pd.to_timedelta((position-1) * resolution, unit='m'))
-          data['UnitName'].append(unit_name)
-          data['Type'].append('load' if type == 'load' else psr_type)
-          data['quantity'].append(quantity)
-  
-  return data_to_df_dict(data)
+    for psr_type, time_series_times, time_series_quantities in iter_time_series(xml, type):
+      times.append(time_series_times)
+      psr_types.append(repeat_object(psr_type, len(time_series_times)))
+      quantities.append(time_series_quantities)
+
+  return {
+    "Time": np.concatenate(times) if times else np.empty(0, dtype=np.int64),
+    "Type": np.concatenate(psr_types) if psr_types else np.empty(0, dtype=object),
+    "quantity": np.concatenate(quantities) if quantities else np.empty(0, dtype=np.int64)
+  }
+
+def iter_time_series(xml, type):
+  """
+  Parse an ENTSO-E document one TimeSeries at a time, discarding each element once it is parsed.
+
+  :param xml: Text of the document.
+  :param type: Either 'load' or 'generation'.
+  :return: Generator of (type, times, quantities) tuples, with the times as nanoseconds since epoch.
+  """
+  for _, element in ET.iterparse(io.StringIO(xml), events=('end',)):
+    if not element.tag.endswith('}TimeSeries'):
+      continue
+    namespace = { 'ns': element.tag.split('}', 1)[0][1:] }
+    psr_type = element.find('ns:MktPSRType/ns:psrType', namespace).text if type == 'generation' else 'load'
+    unit_name = element.find('ns:quantity_Measure_Unit.name', namespace).text
+    if unit_name != 'MAW':
+      raise Exception(f"Unexpected unit: {unit_name}")
+    for period in element.findall('ns:Period', namespace):
+      start_time = pd.Timestamp(period.find('ns:timeInterval/ns:start', namespace).text).value
+      resolution = int(period.find('ns:resolution', namespace).text.replace('PT', '').replace('M', '')) * 60 * 10**9
+      num_points = len(period.findall('ns:Point', namespace))
+      positions  = np.fromiter((position.text for position in period.iterfind('ns:Point/ns:position', namespace)), dtype=np.int64, count=num_points)
+      quantities = np.fromiter((quantity.text for quantity in period.iterfind('ns:Point/ns:quantity', namespace)), dtype=np.int64, count=num_points)
+      yield psr_type, start_time + (positions-1) * resolution, quantities
+    element.clear()
 
 def jsons_to_df_dict(jsons, type):
+  return data_to_df_dict(jsons_to_data(jsons, type))
+
+def jsons_to_data(jsons, type):
+  """
+  Decode Elexon payloads into long records.
+
+  :param jsons: List with the decoded payloads.
+  :param type: Either 'load' or 'generation'.
+  :return: Dictionary with the Time (nanoseconds since epoch), Type and quantity arrays.
+  """
   print(f"\tProcessing {type} data")
 
-  data = { "Time": [], "UnitName": [], "Type": [], "quantity": [] }
-
-  for json in jsons:
-    if type == 'generation':
-      for item in json:
-        startTime = pd.to_datetime(item['startTime'])
-        for generation_entry in item['data']:
-          if fuel_types[generation_entry['fuelType']] == 'nil': continue
-          data['Time'].append(startTime)
-          data['UnitName'].append('MAW')
-          data['Type'].append(fuel_types[generation_entry['fuelType']])
-          data['quantity'].append(generation_entry['generation'])
-    else:
-      for item in json['data']:
-        data['Time'].append(pd.to_datetime(item['startTime']))
-        data['UnitName'].append('MAW')
-        data['Type'].append('load')
-        data['quantity'].append(item['initialDemandOutturn'])
-
-  return data_to_df_dict(data)
+  if type == 'generation':
+    items = [item for json in jsons for item in json]
+    num_entries = np.fromiter((len(item['data']) for item in items), dtype=np.int64, count=len(items))
+    fuel_type_names = np.fromiter((entry['fuelType'] for item in items for entry in item['data']), dtype=object, count=num_entries.sum())
+    generations     = np.fromiter((entry['generation'] for item in items for entry in item['data']), dtype=object, count=num_entries.sum())
+    # Every timestamp is parsed once per item, and then repeated for each one of its entries
+    times = pd.to_datetime([item['startTime'] for item in items]).asi8.repeat(num_entries)
+    fuel_type_codes = pd.Categorical(fuel_type_names, dtype=fuel_type_categories).codes
+    if (fuel_type_codes == -1).any():
+      raise Exception(f"Unexpected fuel type: {fuel_type_names[np.argmax(fuel_type_codes == -1)]}")
+    psr_types = fuel_type_lookup[fuel_type_codes]
+    is_used = psr_types != 'nil'
+    return {
+      "Time": times[is_used],
+      "Type": psr_types[is_used],
+      "quantity": pd.to_numeric(generations[is_used])
+    }
+  else:
+    items = [item for json in jsons for item in json['data']]
+    return {
+      "Time": pd.to_datetime([item['startTime'] for item in items]).asi8,
+      "Type": repeat_object('load', len(items)),
+      "quantity": pd.to_numeric(np.fromiter((item['initialDemandOutturn'] for item in items), dtype=object, count=len(items)))
+    }
+
+def repeat_object(value, size):
+  # np.full would store a new copy of a string in every cell, while repeat shares a single one
+  return np.array([value], dtype=object).repeat(size)
 
 def data_to_df_dict(data):
   # Convert the data dictionary into a pandas DataFrame
-  df = pd.DataFrame(data)
+  df = pd.DataFrame({
+    "Time": pd.to_datetime(data["Time"], utc=True),
+    "UnitName": repeat_object('MAW', len(data["Time"])),
+    "Type": data["Type"],
+    "quantity": data["quantity"]
+  })
 
   # Create a separate DataFrame for each type
   df_dict = { type: df[df["Type"] == type] for type in df["Type"].unique() }
@@ -0,0 +1,330 @@
+import os
+import sys
+import ast
+import json
+import hashlib
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from utils import load_config
+
+src_dir = os.path.abspath(os.path.dirname(__file__))
+
+class Stage:
+  """
+  Script of the pipeline with its declared inputs and outputs. A stage depends on the stages that
+  produce any of its inputs, and only runs again when its inputs, arguments, config sections or code change.
+  """
+  def __init__(self, name, script, args, inputs=(), outputs=(), config_sections=(), opt_in=False):
+    """
+    :param name: Name of the stage.
+    :param script: Script of src that runs the stage.
+    :param args: Command line arguments of the script.
+    :param inputs: Paths of the files the stage reads.
+    :param outputs: Paths of the files the stage writes.
+    :param config_sections: Sections of config.ini the stage reads, besides Telemetry (which never changes its outputs).
+    :param opt_in: Whether the stage only runs when it is a target, otherwise the stages that depend on it
+                   use its existing outputs [default is False].
+    """
+    self.name            = name
+    self.script          = os.path.join(src_dir, script)
+    self.args            = [str(arg) for arg in args]
+    self.inputs          = [os.path.abspath(path) for path in inputs]
+    self.outputs         = [os.path.abspath(path) for path in outputs]
+    self.config_sections = list(config_sections)
+    self.opt_in          = opt_in
+
+class Pipeline:
+  """
+  Runner of a DAG of stages, which skips the stages whose outputs are still valid and runs the
+  independent ones in parallel. The key of every run and the hashes of its outputs are kept in a
+  state file, so the stages are skipped across invocations.
+  """
+  def __init__(self, stages, state_file, force=False):
+    """
+    :param stages: List of stages, their order does not matter.
+    :param state_file: Path of the JSON file with the keys of the last runs and the known file hashes.
+    :param force: Whether to run every stage, even if its outputs are still valid [default is False].
+    """
+    self.stages     = { stage.name: stage for stage in stages }
+    self.state_file = state_file
+    self.force      = force
+    self.lock       = threading.Lock()
+    self.state      = { 'stages': {}, 'files': {} }
+    if os.path.exists(state_file):
+      with open(state_file) as f:
+        self.state = json.load(f)
+    producers = { output: stage.name for stage in stages for output in stage.outputs }
+    self.dependencies = {
+      stage.name: { producers[path] for path in stage.inputs if path in producers } for stage in stages
+    }
+
+  def run(self, targets, max_workers=None):
+    """
+    Run the target stages and the stages they depend on, as soon as their dependencies are finished.
+
+    :param targets: Names of the stages whose outputs are wanted.
+    :param max_workers: Maximum number of stages run at once [default is one per stage].
+    :return: Whether every stage succeeded.
+    """
+    pending = self._get_required_stages(targets, targets)
+    required = set(pending)
+    finished, running = set(), {}
+    success = True
+    with ThreadPoolExecutor(max_workers=max_workers or len(pending) or 1) as executor:
+      while pending or running:
+        for name in sorted(pending):
+          if self.dependencies[name] & required <= finished:
+            pending.remove(name)
+            running[executor.submit(self._run_stage, self.stages[name])] = name
+        if not running:
+          break # The remaining stages depend on failed ones
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+          name = running.pop(future)
+          if future.result():
+            finished.add(name)
+          else:
+            success = False
+            skipped = {stage for stage in pending if name in self._get_required_stages([stage], targets)}
+            pending -= skipped
+            for stage in sorted(skipped):
+              print(f"[{stage}] Not run, as {name} failed")
+    return success
+
+  def _get_required_stages(self, names, targets):
+    # The opt-in stages are only required when they are targets of the run
+    required, queue = set(), list(names)
+    while queue:
+      name = queue.pop()
+      if name not in required:
+        required.add(name)
+        queue.extend(dependency for dependency in self.dependencies[name] if not self.stages[dependency].opt_in or dependency in targets)
+    return required
+
+  def _run_stage(self, stage):
+    """
+    Run a stage unless its outputs are still valid, recording its key and outputs once it succeeds.
+
+    :return: Whether the stage is valid after the call.
+    """
+    key = self._get_stage_key(stage)
+    with self.lock:
+      record = self.state['stages'].get(stage.name)
+    if not self.force and record is not None and record['key'] == key and self._are_outputs_valid(record['outputs']):
+      print(f"[{stage.name}] Up to date, skipped")
+      return True
+    for path in stage.outputs:
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+    print(f"[{stage.name}] Running {os.path.basename(stage.script)} {' '.join(stage.args)}")
+    process = subprocess.Popen([sys.executable, stage.script] + stage.args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    # The output of the stages running in parallel is interleaved, so each line is prefixed with its stage
+    for line in process.stdout:
+      print(f"[{stage.name}] {line}", end='')
+    if process.wait() != 0:
+      print(f"[{stage.name}] Failed with exit code {process.returncode}")
+      return False
+    missing_outputs = [path for path in stage.outputs if not os.path.exists(path)]
+    if missing_outputs:
+      print(f"[{stage.name}] Failed, missing outputs: {', '.join(missing_outputs)}")
+      return False
+    outputs = { path: self._hash_file(path) for path in stage.outputs }
+    with self.lock:
+      self.state['stages'][stage.name] = { 'key': key, 'outputs': outputs }
+      self._save_state()
+    print(f"[{stage.name}] Finished")
+    return True
+
+  def _get_stage_key(self, stage):
+    """
+    :return: Hash of everything that determines the outputs of a stage: its arguments, the content of
+             its inputs, the config sections it reads and the source of the modules it imports.
+    """
+    config = load_config()
+    description = {
+      'args': stage.args,
+      'inputs': { path: self._hash_file(path) if os.path.exists(path) else None for path in stage.inputs },
+      'config': { section: dict(config[section]) for section in stage.config_sections if config.has_section(section) },
+      'code': { os.path.relpath(path, src_dir): self._hash_file(path) for path in sorted(get_code_files(stage.script)) }
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+  def _are_outputs_valid(self, outputs):
+    return all(os.path.exists(path) and self._hash_file(path) == digest for path, digest in outputs.items())
+
+  def _hash_file(self, path):
+    """
+    Hash the content of a file, reusing the known hash while its size and modification time do not change.
+
+    :return: The sha256 of the file.
+    """
+    stat = os.stat(path)
+    with self.lock:
+      known = self.state['files'].get(path)
+    if known is not None and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime_ns:
+      return known['sha256']
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+      for block in iter(lambda: f.read(1 << 20), b''):
+        digest.update(block)
+    with self.lock:
+      self.state['files'][path] = { 'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': digest.hexdigest() }
+    return digest.hexdigest()
+
+  def _save_state(self):
+    os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+    with open(f'{self.state_file}.tmp', 'w') as f:
+      json.dump(self.state, f, indent=2)
+    os.replace(f'{self.state_file}.tmp', self.state_file)
+
+def get_code_files(script):
+  """
+  Find the modules of src a script imports, directly or through other modules.
+
+  :param script: Path of the script.
+  :return: Set of paths of the script and its modules.
+  """
+  files, queue = set(), [os.path.abspath(script)]
+  while queue:
+    path = queue.pop()
+    if path in files:
+      continue
+    files.add(path)
+    with open(path) as f:
+      tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+      if isinstance(node, ast.Import):
+        candidates = [(src_dir, alias.name) for alias in node.names]
+      elif isinstance(node, ast.ImportFrom):
+        package_dir = src_dir
+        if node.level:
+          package_dir = os.path.dirname(path)
+          for _ in range(node.level-1):
+            package_dir = os.path.dirname(package_dir)
+        module = node.module or ''
+        # The imported names may be modules of the package as well
+        candidates = [(package_dir, module)] + [(package_dir, f'{module}.{alias.name}'.strip('.')) for alias in node.names]
+      else:
+        continue
+      for base_dir, module in candidates:
+        module_path = os.path.join(base_dir, *module.split('.')) if module else base_dir
+        for candidate in [f'{module_path}.py', os.path.join(module_path, '__init__.py')]:
+          if os.path.isfile(candidate):
+            queue.append(candidate)
+  return files
+
+def get_stages(args):
+  return [
+    Stage('ingestion', 'data_ingestion.py',
+      ['--start_time', args.start_time, '--end_time', args.end_time, '--output_file', args.raw_data_file],
+      outputs=[args.raw_data_file],
+      config_sections=['Common', 'Ingestion']
+    ),
+    Stage('processing', 'data_processing.py',
+      ['--input_file', args.raw_data_file, '--output_file', args.processed_data_file],
+      inputs=[args.raw_data_file],
+      outputs=[args.processed_data_file],
+      config_sections=['Processing']
+    ),
+    Stage('test_subset', 'save_test_subset.py',
+      ['--input_file', args.processed_data_file, '--output_file', args.test_data_file],
+      inputs=[args.processed_data_file],
+      outputs=[args.test_data_file],
+      opt_in=True
+    ),
+    Stage('training', 'model_training.py',
+      ['--model_type', args.model_type, '--model_file', args.model_file, '--input_file', args.processed_data_file],
+      inputs=[args.processed_data_file],
+      outputs=[args.model_file],
+      config_sections=['Common', 'RecurrentLSTMModel'],
+      opt_in=True
+    ),
+    Stage('prediction', 'model_prediction.py',
+      ['--model_type', args.model_type, '--model_file', args.model_file, '--input_file', args.test_data_file, '--output_file', args.predictions_file],
+      inputs=[args.model_file, args.test_data_file],
+      outputs=[args.predictions_file],
+      config_sections=['Common', 'RecurrentLSTMModel']
+    )
+  ]
+
+def main(args):
+  stages = get_stages(args)
+  pipeline = Pipeline(stages, state_file=os.path.abspath(args.state_file), force=args.force)
+  for target in args.targets:
+    if target not in pipeline.stages:
+      print(f"[!] Invalid stage {target}, the stages are: {', '.join(pipeline.stages)}")
+      sys.exit(1)
+  if not pipeline.run(args.targets, max_workers=args.workers):
+    print("[!] Pipeline failed")
+    sys.exit(1)
+  print("Pipeline completed.")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description='Runs the ingestion, processing, test subset extraction, training and prediction stages, skipping the ones whose outputs are up to date'
+  )
+  parser.add_argument(
+    '--start_time', '-s', type=str,
+    default='2022-01-01',
+    help='start time of the ingested data, format: YYYY-MM-DD [default is 2022-01-01]'
+  )
+  parser.add_argument(
+    '--end_time', '-e', type=str,
+    default='2023-01-01',
+    help='end time of the ingested data, format: YYYY-MM-DD [default is 2023-01-01]'
+  )
+  parser.add_argument(
+    '--raw_data_file', type=str,
+    default=os.path.join(os.path.dirname(__file__), '../data/raw_data.csv'),
+    help='the path of the file where raw data is stored [default is data/raw_data.csv]'
+  )
+  parser.add_argument(
+    '--processed_data_file', type=str,
+    default=os.path.join(os.path.dirname(__file__), '../data/processed_data.csv'),
+    help='the path of the file where processed data is stored [default is data/processed_data.csv]'
+  )
+  parser.add_argument(
+    '--test_data_file', type=str,
+    default=os.path.join(os.path.dirname(__file__), '../data/test.csv'),
+    help='the path of the file where the test subset is stored [default is data/test.csv]'
+  )
+  parser.add_argument(
+    '--model_type', '-t', type=str,
+    default='recurrentLSTM',
+    help='the model iteration to use [default is recurrentLSTM]'
+  )
+  parser.add_argument(
+    '--model_file', '-m', type=str,
+    default=os.path.join(os.path.dirname(__file__), '../models/model.pkl'),
+    help='the path of the file where the trained model is stored [default is models/model.pkl]'
+  )
+  parser.add_argument(
+    '--predictions_file', type=str,
+    default=os.path.join(os.path.dirname(__file__), '../predictions/predictions.json'),
+    help='the path of the file where the predictions are stored [default is predictions/predictions.json]'
+  )
+  parser.add_argument(
+    '--targets', type=str, nargs='+',
+    default=['processing', 'prediction'],
+    help='the stages to bring up to date, along with the stages they depend on; test_subset and training only run when they are targets, e.g. --targets training prediction [default is processing prediction]'
+  )
+  parser.add_argument(
+    '--workers', '-w', type=int,
+    default=None,
+    help='the maximum number of stages run at once [default is one per stage]'
+  )
+  parser.add_argument(
+    '--force', '-f', action='store_true',
+    help='run every required stage, even if its outputs are up to date [default is False]'
+  )
+  parser.add_argument(
+    '--state_file', type=str,
+    default=os.path.join(os.path.dirname(__file__), '../data/pipeline_state.json'),
+    help='the path of the file where the keys of the last runs are kept [default is data/pipeline_state.json]'
+  )
+  args = parser.parse_args()
+  main(args)
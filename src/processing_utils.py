@@ -0,0 +1,201 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+class ProcessingState:
+  """
+  Boundary state carried between the consecutive chunks of raw data of the chunked processing.
+
+  An hourly row can only be finished once every gap it is part of is closed, so the state holds
+  the raw rows of the last (possibly incomplete) hour, the hourly rows with open gaps, the last
+  valid value of each series before them and the last finished row, whose label depends on the
+  next hour. The first and last valid values of each series, found by a first pass over the data,
+  let the rows before and after them be finished right away, as the linear interpolation of the
+  in-memory path extends them as constants (and fills the completely empty series with 0).
+
+  When more rows will be appended to the data later (incremental processing), the last valid values
+  are never known, so the rows after the last valid value of any series are held until a later value
+  closes the gap, or until the gap is longer than a maximum number of hours, after which the series is
+  taken as ended and extended as a constant. The series without any value yet are filled with 0. The state is then saved
+  between runs, which only process the raw rows after the last one seen.
+  """
+  hour = pd.Timedelta(hours=1)
+
+  def __init__(self, start_time=None, open_ended=False, max_gap_hours=None):
+    """
+    :param start_time: Timestamp of the first raw row, the hours are counted from it [default is the first one received].
+    :param open_ended: Whether more rows may be appended to the data in later runs [default is False].
+    :param max_gap_hours: Hours without values after which a series of open ended data is taken as ended [default is never].
+    """
+    self.start_time           = start_time
+    self.open_ended           = open_ended
+    self.max_gap_hours        = max_gap_hours
+    self.last_raw_time        = None # Time of the last raw row received
+    self.partial_hour         = None # Raw rows of the last hour received
+    self.pending              = None # Hourly rows with open gaps, indexed by their position
+    self.next_position        = 0
+    self.anchor_positions     = None # Position and value of the last valid value of each series before the pending rows
+    self.anchor_values        = None
+    self.first_positions      = None # Position and value of the first valid value of each series, -1 if it has none
+    self.first_values         = None
+    self.last_positions       = None # Position of the last valid value of each series, -1 if it has none
+    self.unlabelled_row       = None
+    self.rows_written         = 0
+
+  def split_hours(self, df):
+    """
+    Prepend the raw rows held from the previous chunk and hold the ones of the last hour of this chunk.
+
+    :param df: Chunk of raw rows, in time order.
+    :return: DataFrame with the raw rows of the complete hours.
+    """
+    if self.start_time is None:
+      self.start_time = df['Time'].min()
+    self.last_raw_time = df['Time'].max() # The held rows are older, as the chunks are in time order
+    if self.partial_hour is not None:
+      df = pd.concat([self.partial_hour, df])
+    hours = self.get_positions(df['Time'])
+    is_last_hour = hours == hours.max()
+    self.partial_hour = df[is_last_hour]
+    return df[~is_last_hour]
+
+  def flush_partial_hour(self):
+    """
+    :return: The raw rows held from the last chunk, once there are no more chunks.
+    """
+    df, self.partial_hour = self.partial_hour, None
+    return df
+
+  def observe(self, df):
+    """
+    Record the first and last valid values of each series (first pass).
+
+    :param df: Hourly rows, in time order.
+    """
+    columns = df.columns.drop('Time')
+    if self.first_positions is None:
+      self.first_positions = pd.Series(-1, index=columns)
+      self.first_values    = pd.Series(np.nan, index=columns)
+      self.last_positions  = pd.Series(-1, index=columns)
+    positions = self.get_positions(df['Time']).to_numpy()
+    is_valid = df[columns].notna().to_numpy()
+    has_valid = is_valid.any(axis=0)
+    is_first = has_valid & (self.first_positions.to_numpy() == -1)
+    first_rows = is_valid.argmax(axis=0)
+    last_rows = len(df) - 1 - is_valid[::-1].argmax(axis=0)
+    self.first_positions[is_first] = positions[first_rows[is_first]]
+    self.first_values[is_first] = [df[column].iloc[row] for column, row in zip(columns[is_first], first_rows[is_first])]
+    self.last_positions[has_valid] = positions[last_rows[has_valid]]
+
+  def add_hours(self, df):
+    """
+    Append hourly rows to the pending ones, including the hours without raw rows before them.
+
+    :param df: Hourly rows, in time order and after the previous ones.
+    """
+    positions = self.get_positions(df['Time'])
+    df = df.set_index(positions).reindex(pd.RangeIndex(self.next_position, positions.max()+1))
+    df['Time'] = self.start_time + pd.to_timedelta(df.index, unit='H')
+    self.pending = df if self.pending is None else pd.concat([self.pending, df])
+    self.next_position = positions.max()+1
+    if self.anchor_positions is None:
+      self.anchor_positions = pd.Series(-1, index=df.columns.drop('Time'))
+      self.anchor_values    = pd.Series(np.nan, index=df.columns.drop('Time'))
+
+  def pop_finished_hours(self, final=False):
+    """
+    Remove the pending hourly rows whose gaps are closed and fill them as clean_data would.
+
+    :param final: Whether there are no more rows, so every pending row is finished.
+    :return: DataFrame with the finished rows, or None if there are none.
+    """
+    if self.pending is None or len(self.pending) == 0:
+      return None
+    columns = self.pending.columns.drop('Time')
+    positions = self.pending.index.to_numpy()
+    original_values = self.pending[columns].to_numpy(dtype=np.float64)
+    is_valid = ~np.isnan(original_values)
+    has_valid = is_valid.any(axis=0)
+    # Position of the last valid value seen of each series
+    seen = np.where(has_valid, positions[len(positions) - 1 - is_valid[::-1].argmax(axis=0)], self.anchor_positions)
+    # Each series is finished up to its last valid value, or completely if no more values will come
+    finished_until = np.where(seen >= 0, seen, self.first_positions - 1)
+    is_complete = self.last_positions.to_numpy() == -1
+    if not self.open_ended:
+      is_complete |= seen >= self.last_positions.to_numpy()
+    elif self.max_gap_hours is not None:
+      is_complete |= positions[-1] - seen > self.max_gap_hours
+    finished_until[is_complete] = positions[-1]
+    cut = positions[-1] if final else min(finished_until.min(), positions[-1])
+    if cut < positions[0]:
+      return None
+    num_finished = cut - positions[0] + 1
+    finished = self.pending.iloc[:num_finished].copy()
+    self.pending = self.pending.iloc[num_finished:]
+
+    for i, column in enumerate(columns):
+      values = finished[column].to_numpy()
+      is_missing = np.isnan(values)
+      if not is_missing.any():
+        continue
+      known_positions = positions[is_valid[:, i]]
+      known_values = original_values[is_valid[:, i], i]
+      if self.anchor_positions[column] >= 0:
+        known_positions = np.concatenate([[self.anchor_positions[column]], known_positions])
+        known_values = np.concatenate([[self.anchor_values[column]], known_values])
+      elif len(known_positions) == 0 and self.first_positions[column] >= 0:
+        known_positions = np.array([self.first_positions[column]])
+        known_values = np.array([self.first_values[column]])
+      if len(known_positions):
+        values = values.copy()
+        values[is_missing] = np.interp(finished.index.to_numpy()[is_missing], known_positions, known_values)
+        finished[column] = values
+    # The valid values of the finished rows are the anchors of the next gaps
+    finished_valid = is_valid[:num_finished]
+    has_finished_valid = finished_valid.any(axis=0)
+    last_rows = num_finished - 1 - finished_valid[::-1].argmax(axis=0)
+    self.anchor_positions[has_finished_valid] = positions[last_rows[has_finished_valid]]
+    self.anchor_values[has_finished_valid] = original_values[last_rows[has_finished_valid], has_finished_valid]
+    return finished.fillna(0).reset_index(drop=True)
+
+  def hold_last_row(self, df):
+    """
+    Prepend the row held from the previous chunk and hold the last one, which can not be labelled until the next hour is known.
+
+    :param df: Finished rows.
+    :return: DataFrame with the held row and the given ones (the last one is dropped when computing the labels).
+    """
+    if self.unlabelled_row is not None:
+      df = pd.concat([self.unlabelled_row, df], ignore_index=True)
+    self.unlabelled_row = df.iloc[[-1]]
+    return df
+
+  def number_rows(self, df):
+    """
+    Give the rows written to the output consecutive indexes, following the previous chunks.
+
+    :param df: Labelled rows.
+    :return: The same DataFrame with the new index.
+    """
+    df.index = pd.RangeIndex(self.rows_written, self.rows_written+len(df))
+    self.rows_written += len(df)
+    return df
+
+  def save(self, filePath):
+    """
+    Save the state, replacing the previous one only once it is completely written.
+
+    :param filePath: Path of the state file.
+    """
+    with open(f'{filePath}.tmp', 'wb') as f:
+      pickle.dump(self, f)
+    os.replace(f'{filePath}.tmp', filePath)
+
+  @staticmethod
+  def load(filePath):
+    with open(filePath, 'rb') as f:
+      return pickle.load(f)
+
+  def get_positions(self, times):
+    return (times - self.start_time) // self.hour
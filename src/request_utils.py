@@ -0,0 +1,206 @@
+import time
+import random
+import threading
+import requests
+import numpy as np
+
+from collections import deque, defaultdict
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+class RequestClient:
+  """
+  HTTP client shared by all the ingestion threads.
+
+  It keeps one pooled keep-alive session per host and caps the number of requests
+  that are simultaneously in flight against each host. Requests are throttled by a token
+  bucket per host, and the ones that fail with a 429, a 5xx or a connection error are
+  retried with jittered exponential backoff, as well as the ones that time out. If a ResponseCache is given, the responses
+  of closed windows are served from it.
+  """
+  retry_status_codes = [ 429, 500, 502, 503, 504 ]
+
+  def __init__(self, max_workers=1, max_connections=None, rate_limits=None, max_retries=5, backoff_seconds=1, timeout=None, cache=None):
+    """
+    :param max_workers: Number of threads used to fetch chunks concurrently (1 means sequential).
+    :param max_connections: Dictionary mapping each host to its maximum number of concurrent requests.
+    :param rate_limits: Dictionary mapping each host to its maximum number of requests per minute.
+    :param max_retries: Number of times a failed request is retried before giving up.
+    :param backoff_seconds: Base delay of the exponential backoff between retries.
+    :param timeout: (connect, read) seconds after which a request is considered failed, None waits forever.
+    :param cache: Optional ResponseCache.
+    """
+    self.max_workers     = max_workers
+    self.max_connections = max_connections or {}
+    self.rate_limits     = rate_limits or {}
+    self.max_retries     = max_retries
+    self.backoff_seconds = backoff_seconds
+    self.timeout         = timeout
+    self.cache           = cache
+    self.metrics         = RequestMetrics()
+    self._sessions   = {}
+    self._semaphores = {}
+    self._buckets    = {}
+    self._lock       = threading.Lock()
+    self._executor   = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def get(self, url, params=None, window_end=None):
+    """
+    Perform a GET request through the pooled session of the url host, retrying it if needed.
+
+    :param url: Url to request.
+    :param params: Query parameters of the request.
+    :param window_end: End of the time window covered by the request, used to decide whether it can be cached.
+    :return: The body of the response, if its status code is 200.
+    """
+    if self.cache is not None and window_end is not None:
+      body = self.cache.get(url, params, window_end)
+      if body is not None:
+        return body
+    endpoint = self._get_endpoint(url, params)
+    session, semaphore, bucket = self._get_host_resources(urlsplit(url).netloc)
+    for attempt in range(self.max_retries+1):
+      bucket.acquire()
+      with semaphore:
+        start = time.perf_counter()
+        try:
+          response = session.get(url, params=params, headers=None, timeout=self.timeout)
+          status_code, retry_after = response.status_code, response.headers.get('Retry-After')
+          self.metrics.record(endpoint, time.perf_counter()-start, len(response.content))
+        except (requests.ConnectionError, requests.Timeout) as e:
+          status_code, retry_after = type(e).__name__, None
+          self.metrics.record(endpoint, time.perf_counter()-start, 0)
+      if status_code == 200:
+        break
+      if isinstance(status_code, int) and status_code not in self.retry_status_codes:
+        raise Exception(f"API request failed. Status code: {status_code}")
+      if attempt == self.max_retries:
+        raise Exception(f"API request failed after {self.max_retries} retries. Status code: {status_code}")
+      self.metrics.record_retry(endpoint)
+      delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff_seconds * 2**attempt * random.uniform(0.5, 1.5)
+      print(f"\tRequest to {endpoint} failed ({status_code}), retrying in {delay:.1f} s")
+      time.sleep(delay)
+    if self.cache is not None:
+      self.cache.put(url, params, response.text)
+    return response.text
+
+  def iter_all(self, queries, max_in_flight=None):
+    """
+    Perform all the given requests, concurrently if the client has more than one worker,
+    yielding each body as soon as it and all the previous ones are available.
+
+    :param queries: List of (url, params, window_end) tuples.
+    :param max_in_flight: Maximum number of requests started but not consumed yet [default is twice the workers].
+    :return: Generator of the bodies of the responses, in the same order as the queries.
+    """
+    if self._executor is None:
+      yield from (self.get(*query) for query in queries)
+      return
+    max_in_flight = max_in_flight or 2*self.max_workers
+    futures = deque()
+    for query in queries:
+      futures.append(self._executor.submit(self.get, *query))
+      if len(futures) >= max_in_flight:
+        yield futures.popleft().result()
+    while futures:
+      yield futures.popleft().result()
+
+  def close(self):
+    if self._executor is not None:
+      self._executor.shutdown(wait=True)
+    for session in self._sessions.values():
+      session.close()
+    if self.cache is not None:
+      self.cache.evict()
+
+  def _get_host_resources(self, host):
+    with self._lock:
+      if host not in self._sessions:
+        max_connections = self.max_connections.get(host, self.max_workers)
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=max_connections))
+        session.mount('http://',  HTTPAdapter(pool_connections=1, pool_maxsize=max_connections))
+        self._sessions[host]   = session
+        self._semaphores[host] = threading.BoundedSemaphore(max_connections)
+        self._buckets[host]    = TokenBucket(self.rate_limits.get(host))
+      return self._sessions[host], self._semaphores[host], self._buckets[host]
+
+  @staticmethod
+  def _get_endpoint(url, params):
+    endpoint = urlsplit(url)._replace(query='', fragment='').geturl()
+    if params and 'documentType' in params: # All the ENTSO-E documents share the same url
+      endpoint += f"?documentType={params['documentType']}"
+    return endpoint
+
+class TokenBucket:
+  """
+  Thread-safe token bucket that allows bursts of up to a minute worth of requests.
+  """
+  def __init__(self, requests_per_minute=None):
+    """
+    :param requests_per_minute: Sustained rate of the bucket, None means unlimited.
+    """
+    self.rate     = requests_per_minute / 60 if requests_per_minute else None
+    self.capacity = requests_per_minute
+    self.tokens   = requests_per_minute
+    self.updated  = time.monotonic()
+    self._lock    = threading.Lock()
+
+  def acquire(self):
+    """
+    Take a token, waiting until one is available.
+    """
+    if self.rate is None:
+      return
+    while True:
+      with self._lock:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now-self.updated)*self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+          self.tokens -= 1
+          return
+        wait = (1-self.tokens) / self.rate
+      time.sleep(wait)
+
+class RequestMetrics:
+  """
+  Thread-safe latency, transferred bytes and retry counters per endpoint.
+  """
+  latency_buckets = [ 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60 ]
+
+  def __init__(self):
+    self.latencies = defaultdict(list)
+    self.bytes     = defaultdict(int)
+    self.retries   = defaultdict(int)
+    self._lock     = threading.Lock()
+
+  def record(self, endpoint, latency, num_bytes):
+    with self._lock:
+      self.latencies[endpoint].append(latency)
+      self.bytes[endpoint] += num_bytes
+
+  def record_retry(self, endpoint):
+    with self._lock:
+      self.retries[endpoint] += 1
+
+  def summary(self):
+    """
+    :return: Text with the number of requests, retries, bytes, latency percentiles and histogram of each endpoint.
+    """
+    lines = []
+    labels = [f'<{bucket}s' for bucket in self.latency_buckets] + [f'>={self.latency_buckets[-1]}s']
+    for endpoint, latencies in sorted(self.latencies.items()):
+      histogram = np.bincount(np.searchsorted(self.latency_buckets, latencies, side='right'), minlength=len(labels))
+      p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+      lines.append(f"{endpoint}: {len(latencies)} requests, {self.retries[endpoint]} retries, {self.bytes[endpoint]/1e6:.1f} MB")
+      lines.append(f"\tlatency p50 {p50:.2f} s, p95 {p95:.2f} s, p99 {p99:.2f} s, max {max(latencies):.2f} s")
+      lines.append("\thistogram " + ", ".join(f"{label}: {count}" for label, count in zip(labels, histogram) if count))
+    return "\n".join(lines) if lines else "No requests were performed"
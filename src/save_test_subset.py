@@ -2,10 +2,12 @@ import os
 import sys
 import json
 import argparse
-import pandas as pd
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
+import storage_utils
+import telemetry_utils
+
 def main(args):
   df = load_df(filePath=os.path.abspath(args.input_file))
   if args.size == 0.2:
@@ -20,16 +22,13 @@ def main(args):
   if not args.labeled:
     df = df.drop(columns=['label'])
   save_df(df, filePath=os.path.abspath(args.output_file))
+  telemetry_utils.record(rows=len(df), columns=df.shape[1])
 
 def load_df(filePath):
-  df = pd.read_csv(filePath, index_col=0)
-  df['Time'] = pd.to_datetime(df['Time'])
-  numeric_cols = df.columns.difference(['id', 'Time'])
-  df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce', downcast='float')
-  return df
+  return storage_utils.load_df(filePath)
 
 def save_df(df, filePath):
-  df.to_csv(filePath, index=True)
+  storage_utils.save_df(df, filePath)
 
 def save_predictions(predictions, output_file):
   try:
@@ -69,5 +68,10 @@ if __name__ == "__main__":
     '--labeled', '-l', action='store_true',
     help='whether the test subset is labeled or not [default is False]'
   )
+  parser.add_argument(
+    '--profile', action='store_true',
+    help='dump a cProfile of the run next to the telemetry file [default is False]'
+  )
   args = parser.parse_args()
-  main(args)
\ No newline at end of file
+  with telemetry_utils.stage('test_subset', profile=args.profile):
+    main(args)
\ No newline at end of file
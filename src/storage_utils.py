@@ -0,0 +1,363 @@
+import io
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import telemetry_utils
+
+# Every pipeline artifact is stored in the format given by the extension of its file
+formats = {
+  '.csv': 'csv',
+  '.parquet': 'parquet',
+  '.feather': 'feather'
+}
+
+# Compact dtypes shared by every stage: values are float32 and labels (country ids) int8
+value_dtype   = 'float32'
+label_dtype   = 'int8'
+label_columns = [ 'label' ]
+
+def get_format(filePath):
+  """
+  Get the storage format of a file from its extension, csv is used for unknown extensions.
+
+  :param filePath: Path of the file.
+  :return: Either 'csv', 'parquet' or 'feather'.
+  """
+  return formats.get(os.path.splitext(filePath)[1].lower(), 'csv')
+
+@telemetry_utils.timed
+def load_df(filePath, columns=None):
+  """
+  Load a DataFrame, with the Time column as tz-aware timestamps.
+
+  :param filePath: Path of the file.
+  :param columns: Optional list of the columns to read, the other ones are not even parsed.
+  :return: Loaded DataFrame, with the columns in the order of the file.
+  """
+  format = get_format(filePath)
+  columns = None if columns is None else [column for column in get_columns(filePath) if column in columns]
+  if format == 'parquet':
+    df = pd.read_parquet(filePath, columns=columns)
+  elif format == 'feather':
+    # Feather files can not store the index, so it is kept as a column
+    df = pd.read_feather(filePath, columns=None if columns is None else ['index'] + columns).set_index('index').rename_axis(None)
+  else:
+    # The values are parsed straight into their compact dtypes, instead of into float64 first
+    df = pd.read_csv(filePath, index_col=0, **get_csv_options(filePath, columns))
+    if 'Time' in df:
+      df['Time'] = pd.to_datetime(df['Time'])
+  return compact_dtypes(df)
+
+def iter_df(filePath, chunk_size, columns=None, after=None):
+  """
+  Load a DataFrame in consecutive chunks, with the Time column as tz-aware timestamps.
+
+  :param filePath: Path of the file.
+  :param chunk_size: Maximum number of rows of each chunk.
+  :param columns: Optional list of the columns to read, the other ones are not even parsed.
+  :param after: Optional timestamp, only the rows with a later Time are loaded. The file must be sorted by Time,
+                and the rows before it are skipped without being read (except the ones sharing a row group or batch).
+  :return: Generator of DataFrames, in the order of the file.
+  """
+  format = get_format(filePath)
+  columns = None if columns is None else [column for column in get_columns(filePath) if column in columns]
+  if format == 'parquet':
+    parquet_file = pq.ParquetFile(filePath)
+    row_groups = range(parquet_file.num_row_groups)
+    if after is not None:
+      row_groups = row_groups[_count_stale_row_groups(parquet_file, after):]
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups, columns=columns, use_pandas_metadata=True):
+      schema = batch.schema.with_metadata(parquet_file.schema_arrow.metadata)
+      yield from _rows_after(compact_dtypes(pa.Table.from_batches([batch], schema=schema).to_pandas()), after)
+  elif format == 'feather':
+    # Record batches are decompressed one at a time, the file is never read as a whole
+    reader = pa.ipc.open_file(pa.memory_map(filePath))
+    first_batch = 0
+    if after is not None:
+      # Walk the batches backwards until the first one that only has older rows
+      first_batch = next((i+1 for i in reversed(range(reader.num_record_batches)) if _is_stale_batch(reader.get_batch(i), after)), 0)
+    for i in range(first_batch, reader.num_record_batches):
+      batch = reader.get_batch(i)
+      if columns is not None:
+        batch = batch.select(['index'] + columns)
+      for offset in range(0, batch.num_rows, chunk_size):
+        yield from _rows_after(compact_dtypes(batch.slice(offset, chunk_size).to_pandas().set_index('index').rename_axis(None)), after)
+  else:
+    options = get_csv_options(filePath, columns)
+    with open(filePath, 'rb') as f:
+      if after is not None:
+        # Only the lines after the timestamp are read, walking the file backwards
+        header = pd.read_csv(filePath, nrows=0).columns
+        end = offset = f.seek(0, os.SEEK_END)
+        for line_offset, line in _reverse_lines(f):
+          index, time = line.decode().split(',')[:2]
+          if index == '' or pd.Timestamp(time) <= after:
+            break
+          offset = line_offset
+        if offset == end:
+          return
+        f.seek(offset)
+        options.update(header=None, names=list(header))
+      for df in pd.read_csv(f, index_col=0, chunksize=chunk_size, **options):
+        df.index.name = None # The header is not read when skipping lines
+        if 'Time' in df:
+          df['Time'] = pd.to_datetime(df['Time'])
+        yield compact_dtypes(df)
+
+def _count_stale_row_groups(parquet_file, after):
+  """
+  :return: Number of leading row groups of a Parquet file whose rows are not after the timestamp, according to their statistics.
+  """
+  time_index = parquet_file.schema_arrow.get_field_index('Time')
+  for i in range(parquet_file.num_row_groups):
+    statistics = parquet_file.metadata.row_group(i).column(time_index).statistics
+    if statistics is None or not statistics.has_min_max or statistics.max > after:
+      return i
+  return parquet_file.num_row_groups
+
+def _is_stale_batch(batch, after):
+  return batch.num_rows == 0 or batch.column('Time')[batch.num_rows-1].as_py() <= after
+
+def _rows_after(df, after):
+  """
+  :return: Generator of the DataFrame filtered to the rows after the timestamp, nothing if none is.
+  """
+  if after is None:
+    yield df
+  elif (df['Time'] > after).any():
+    yield df[df['Time'] > after].copy()
+
+def get_columns(filePath):
+  """
+  Read the names of the columns of a file, without its index and without reading its data.
+
+  :param filePath: Path of the file.
+  :return: List with the names of the columns, in the order of the file.
+  """
+  format = get_format(filePath)
+  if format == 'parquet':
+    schema = pq.read_schema(filePath)
+    index_columns = schema.pandas_metadata.get('index_columns', []) if schema.pandas_metadata else []
+    return [name for name in schema.names if name not in index_columns]
+  elif format == 'feather':
+    return [name for name in pa.ipc.open_file(pa.memory_map(filePath)).schema.names if name != 'index']
+  return list(pd.read_csv(filePath, index_col=0, nrows=0).columns)
+
+def compact_dtypes(df):
+  """
+  Cast the numeric columns of a DataFrame to the compact dtypes of the pipeline, leaving the ones that already have them untouched.
+
+  :param df: DataFrame to be cast.
+  :return: DataFrame with float32 values and int8 labels.
+  """
+  dtypes = {
+    column: label_dtype if column in label_columns else value_dtype
+    for column, dtype in df.dtypes.items() if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+  }
+  dtypes = { column: dtype for column, dtype in dtypes.items() if df[column].dtype != dtype }
+  return df.astype(dtypes) if dtypes else df
+
+def get_csv_options(filePath, columns=None):
+  header = pd.read_csv(filePath, nrows=0).columns # The first column is the index
+  used_columns = header[1:] if columns is None else columns
+  return {
+    'usecols': None if columns is None else [header[0]] + columns,
+    'dtype': { column: label_dtype if column in label_columns else value_dtype for column in used_columns if column != 'Time' }
+  }
+
+@telemetry_utils.timed
+def save_df(df, filePath):
+  """
+  Save a DataFrame, including its index.
+
+  :param df: DataFrame to be saved.
+  :param filePath: Path of the file.
+  """
+  format = get_format(filePath)
+  if format == 'parquet':
+    # Small row groups let iter_df read the file in chunks without decoding much more than each chunk
+    df.to_parquet(filePath, index=True, row_group_size=65536)
+  elif format == 'feather':
+    df.rename_axis('index').reset_index().to_feather(filePath)
+  else:
+    df.to_csv(filePath, index=True)
+
+class DataFrameWriter:
+  """
+  Writer of a file made of consecutive chunks, so the whole DataFrame never needs to be held in memory.
+
+  Every chunk must have the same columns and dtypes as the first one. The file is the same one
+  save_df would have written with the concatenation of all the chunks.
+
+  When appending to an existing file, CSV rows are appended in place, while the columnar files,
+  which can not be extended, are written again with the new chunks when closing the writer.
+  """
+  def __init__(self, filePath, append=False, kept_rows=None):
+    """
+    :param filePath: Path of the file, its extension sets the format.
+    :param append: Whether to append the chunks to the existing file, which must have the same columns [default is False].
+    :param kept_rows: When appending, the rows of the existing file whose index is kept_rows or higher are replaced by
+                      the chunks, its index being the row number [default is keeping all of them].
+    """
+    self.filePath  = filePath
+    self.format    = get_format(filePath)
+    self.schema    = None
+    self.kept_rows = kept_rows
+    self._writer   = None
+    self._columns  = get_columns(filePath) if append else None
+    self._chunks   = [] if append and self.format != 'csv' else None
+    if append and self.format == 'csv' and kept_rows is not None:
+      _truncate_csv_rows(filePath, kept_rows)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def write(self, df):
+    """
+    Append a chunk, including its index.
+
+    :param df: DataFrame to be written.
+    """
+    if self._columns is not None:
+      if set(df.columns) != set(self._columns):
+        raise Exception(f"The columns of {self.filePath} do not match the appended data")
+      df = df[self._columns]
+    if self._chunks is not None:
+      self._chunks.append(df)
+      return
+    if self.format == 'csv':
+      is_new_file = self.schema is None and self._columns is None
+      df.to_csv(self.filePath, mode='w' if is_new_file else 'a', header=is_new_file, index=True)
+      self.schema = df.dtypes
+      return
+    if self.format == 'feather':
+      # As in save_df, the index is kept as a column
+      table = pa.Table.from_pandas(df.rename_axis('index').reset_index(), schema=self.schema, preserve_index=False)
+    else:
+      table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=True)
+    if self._writer is None:
+      self.schema = table.schema
+      if self.format == 'feather':
+        self._writer = pa.ipc.new_file(self.filePath, self.schema, options=pa.ipc.IpcWriteOptions(compression='lz4'))
+      else:
+        self._writer = pq.ParquetWriter(self.filePath, self.schema)
+    self._writer.write_table(table)
+
+  def close(self):
+    if self._chunks is not None and (self._chunks or self.kept_rows is not None):
+      stored_df = load_df(self.filePath)
+      if self.kept_rows is not None:
+        stored_df = stored_df[stored_df.index < self.kept_rows]
+      save_df(pd.concat([stored_df] + self._chunks), self.filePath)
+      self._chunks = None
+    if self._writer is not None:
+      self._writer.close()
+      self._writer = None
+
+@telemetry_utils.timed
+def append_df(df, filePath, first_time):
+  """
+  Replace the rows of an existing file from the given timestamp onwards with the rows of
+  the DataFrame, following the column order of the file. The values missing from the DataFrame
+  (e.g. of a source that returned nothing) keep the ones stored for the same timestamp.
+
+  :param df: DataFrame to be appended.
+  :param filePath: Path of the existing file.
+  :param first_time: Timestamp of the first row of the DataFrame.
+  """
+  if get_format(filePath) != 'csv':
+    # Columnar files can not be extended, so they are written again
+    stored_df = load_df(filePath)
+    if set(stored_df.columns) != set(df.columns):
+      raise Exception(f"The columns of {filePath} do not match the ingested data")
+    df = _fill_from_stored(df, stored_df[stored_df['Time'] >= first_time])
+    stored_df = stored_df[stored_df['Time'] < first_time]
+    first_index = stored_df.index[-1]+1 if len(stored_df) else 0
+    df = df[stored_df.columns].set_index(pd.RangeIndex(first_index, first_index+len(df)))
+    save_df(pd.concat([stored_df, df]), filePath)
+    return
+  columns = pd.read_csv(filePath, index_col=0, nrows=0).columns
+  if set(columns) != set(df.columns):
+    raise Exception(f"The columns of {filePath} do not match the ingested data")
+  dtypes = get_csv_options(filePath)['dtype']
+  with open(filePath, 'rb+') as f:
+    # Only the rows that are replaced are read, walking the file backwards
+    for offset, line in _reverse_lines(f):
+      index, time = line.decode().split(',')[:2]
+      if index == '' or pd.Timestamp(time) < first_time:
+        first_index = 0 if index == '' else int(index)+1
+        f.seek(offset+len(line)+1)
+        replaced_rows = f.read()
+        f.truncate(offset+len(line)+1)
+        break
+  if replaced_rows:
+    stored_df = pd.read_csv(io.BytesIO(replaced_rows), header=None, names=['index'] + list(columns), index_col=0, dtype=dtypes)
+    stored_df['Time'] = pd.to_datetime(stored_df['Time'])
+    df = _fill_from_stored(df, stored_df)
+  df = df[columns].set_index(pd.RangeIndex(first_index, first_index+len(df)))
+  df.to_csv(filePath, mode='a', header=False, index=True)
+
+def _fill_from_stored(df, stored_df):
+  """
+  :return: DataFrame with the timestamps of both DataFrames, sorted by Time, whose missing values are taken from stored_df.
+  """
+  if stored_df.empty:
+    return df
+  df = df.set_index('Time').combine_first(stored_df.set_index('Time')).reset_index()
+  return compact_dtypes(df)
+
+def get_last_time(filePath):
+  """
+  Read the timestamp of the last row of a file, without parsing the whole file.
+
+  :param filePath: Path of the file.
+  :return: Timestamp of the last row.
+  """
+  format = get_format(filePath)
+  if format == 'parquet':
+    return pd.read_parquet(filePath, columns=['Time'])['Time'].iloc[-1]
+  elif format == 'feather':
+    return pd.read_feather(filePath, columns=['Time'])['Time'].iloc[-1]
+  with open(filePath, 'rb') as f:
+    _, line = next(_reverse_lines(f))
+  return pd.Timestamp(line.decode().split(',')[1])
+
+def _truncate_csv_rows(filePath, num_rows):
+  """
+  Remove the rows of a CSV file whose index is num_rows or higher, walking the file backwards.
+  """
+  with open(filePath, 'rb+') as f:
+    for offset, line in _reverse_lines(f):
+      index = line.decode().split(',')[0]
+      if index == '' or int(index) < num_rows: # The header has no index
+        f.truncate(offset+len(line)+1)
+        return
+
+def _reverse_lines(f):
+  """
+  Iterate over the non empty lines of a binary file, from the last one to the first one.
+
+  :param f: File opened in binary mode.
+  :return: Generator of (offset, line) tuples.
+  """
+  position = f.seek(0, os.SEEK_END)
+  pending = b''
+  while position > 0:
+    read_size = min(65536, position)
+    position -= read_size
+    f.seek(position)
+    lines = (f.read(read_size) + pending).split(b'\n')
+    pending = lines.pop(0) # The first line may continue in the previous block
+    offset = position + len(pending) + 1
+    offsets = []
+    for line in lines:
+      offsets.append((offset, line))
+      offset += len(line) + 1
+    yield from ((offset, line) for offset, line in reversed(offsets) if line)
+  if pending:
+    yield 0, pending
@@ -0,0 +1,152 @@
+"""
+Performance telemetry of the pipeline, written as JSON lines to the TelemetryFile of config.ini.
+
+Every stage (a whole script, or a part of it like the windowing) records its wall and CPU time,
+the peak RSS of the process, the bytes it read and wrote and, when known, its rows per second.
+The functions decorated with timed accumulate their number of calls, wall and CPU time, which
+are written once the outermost stage finishes. Every line carries the id of the run, so the
+lines of different runs can be told apart and compared.
+"""
+import os
+import sys
+import json
+import time
+import cProfile
+import functools
+import threading
+
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+from utils import load_config
+
+try:
+  import resource
+except ImportError: # Not available on Windows
+  resource = None
+
+run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+
+_lock           = threading.Lock()
+_stages         = [] # Records of the active stages, the innermost one last
+_function_stats = {}
+
+def get_telemetry_file():
+  """
+  :return: Path of the JSON lines file, or None if the telemetry is disabled.
+  """
+  path = load_config().get('Telemetry', 'TelemetryFile', fallback='')
+  return os.path.abspath(os.path.join(os.path.dirname(__file__), path)) if path else None
+
+# Set it to None to disable the telemetry (e.g. in the benchmarks)
+telemetry_file = get_telemetry_file()
+
+@contextmanager
+def stage(name, profile=False):
+  """
+  Measure a stage of the pipeline and write its record when it finishes.
+
+  :param name: Name of the stage, e.g. processing.
+  :param profile: Whether to also dump a cProfile of the stage next to the telemetry file [default is False].
+  :return: Context manager yielding the record of the stage, where rows and other fields can be added.
+  """
+  record = { 'name': name }
+  if _stages:
+    record['parent'] = _stages[-1]['name']
+  _stages.append(record)
+  profiler = cProfile.Profile() if profile else None
+  io_start = _read_io()
+  wall_start, cpu_start = time.perf_counter(), time.process_time()
+  if profiler is not None:
+    profiler.enable()
+  try:
+    yield record
+  finally:
+    if profiler is not None:
+      profiler.disable()
+    record['wall_s'] = time.perf_counter() - wall_start
+    record['cpu_s'] = time.process_time() - cpu_start
+    record['peak_rss_mb'] = _get_peak_rss()
+    io_end = _read_io()
+    if io_start is not None and io_end is not None:
+      record['bytes_read'] = io_end['rchar'] - io_start['rchar']
+      record['bytes_written'] = io_end['wchar'] - io_start['wchar']
+    if 'rows' in record and record['wall_s'] > 0:
+      record['rows_per_s'] = record['rows'] / record['wall_s']
+    _stages.pop()
+    _write('stage', record)
+    if profiler is not None:
+      _dump_profile(profiler, name)
+    if not _stages:
+      _write_function_stats()
+
+def record(**fields):
+  """
+  Add fields (e.g. rows or columns) to the record of the innermost active stage, if any.
+  """
+  if _stages:
+    _stages[-1].update(fields)
+
+def timed(function):
+  """
+  Decorator that accumulates the number of calls, wall time and CPU time of a function.
+  The CPU time is the one of the whole process, so it includes other threads running meanwhile.
+  """
+  module = function.__module__
+  if module == '__main__': # Named after the script, as when it is imported
+    module = os.path.splitext(os.path.basename(sys.modules['__main__'].__file__))[0]
+  name = f'{module}.{function.__qualname__}'
+  @functools.wraps(function)
+  def wrapper(*args, **kwargs):
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+      return function(*args, **kwargs)
+    finally:
+      wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+      with _lock:
+        stats = _function_stats.setdefault(name, { 'name': name, 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0 })
+        stats['calls'] += 1
+        stats['wall_s'] += wall
+        stats['cpu_s'] += cpu
+  return wrapper
+
+def _write_function_stats():
+  with _lock:
+    records = sorted(_function_stats.values(), key=lambda stats: -stats['wall_s'])
+    _function_stats.clear()
+  for stats in records:
+    _write('function', stats)
+
+def _write(type, record):
+  if telemetry_file is None:
+    return
+  line = json.dumps({
+    'run': run_id,
+    'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    'type': type,
+    **record
+  })
+  os.makedirs(os.path.dirname(telemetry_file), exist_ok=True)
+  with _lock, open(telemetry_file, 'a') as f:
+    f.write(line + '\n')
+
+def _dump_profile(profiler, name):
+  directory = os.path.dirname(telemetry_file) if telemetry_file is not None else os.getcwd()
+  profile_file = os.path.join(directory, f'{name}-{run_id}.prof')
+  profiler.dump_stats(profile_file)
+  print(f"Profile of {name} saved to {profile_file}, inspect it with: python -m pstats {profile_file}")
+
+def _get_peak_rss():
+  if resource is None:
+    return None
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # In MB, as ru_maxrss is in KB on Linux
+
+def _read_io():
+  """
+  :return: Characters read and written by the process so far (including sockets), or None if unknown (only Linux exposes them).
+  """
+  try:
+    with open('/proc/self/io') as f:
+      return { key: int(value) for key, value in (line.split(': ') for line in f if line.strip()) }
+  except OSError:
+    return None